@@ -0,0 +1,4 @@
+"""Benchmarks of python-ccr against a local mock CCR server
+
+run them with 'python -m benchmarks --help'
+"""
@@ -0,0 +1,47 @@
+"""python -m benchmarks [--output results.json] [--baseline old.json] ..."""
+
+import argparse
+import json
+import sys
+from benchmarks.suite import BENCHMARKS, run, compare
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="benchmark python-ccr against a local mock CCR")
+    parser.add_argument("-n", "--iterations", type=int, default=100,
+                        help="operations per benchmark, at most a tenth of --packages")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="threads per benchmark")
+    parser.add_argument("--latency", type=float, default=0, help="seconds the server waits per request")
+    parser.add_argument("--payload", type=int, default=64, help="bytes of each package description")
+    parser.add_argument("--packages", type=int, default=1000, help="packages on the server")
+    parser.add_argument("--only", action="append", choices=[name for name, _ in BENCHMARKS],
+                        help="run this benchmark only, may be repeated")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare with, exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.iterations, args.concurrency, args.latency, args.payload,
+                  args.packages, args.only)
+    print("{:<12} {:>6} {:>6} {:>10} {:>9} {:>9} {:>9}".format(
+        "benchmark", "ops", "errors", "ops/s", "p50 ms", "p99 ms", "requests"))
+    for name, result in results["results"].items():
+        print("{:<12} {ops:>6} {errors:>6} {throughput:>10.1f} {p50:>9.2f} {p99:>9.2f} {requests:>9}".format(
+            name, **result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for name, metric, before, now in regressions:
+            print("regression: {} {} {:.2f} -> {:.2f}".format(name, metric, before, now))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
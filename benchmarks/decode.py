@@ -0,0 +1,96 @@
+"""CPU cost of decoding large RPC responses
+
+python -m benchmarks.decode [--rows 2000] [--output decode.json]
+
+compares the former text path (charset detection, then json.loads on the
+decoded text) with _get_ccr_json's byte-level decoding through the json
+module and, when it is installed, orjson
+"""
+
+import argparse
+import functools
+import json
+import sys
+import time
+from requests.models import Response
+from ccr.ccr import Struct, _to_structs
+from benchmarks.server import _package
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def body(rows, payload):
+    """returns the bytes of a search response with 'rows' results, some of
+    them with non-ASCII descriptions
+    """
+    results = []
+    for number in range(rows):
+        row = _package(number, "pkg{:05d}".format(number), "bench", payload)
+        if number % 10 == 0:
+            row["Description"] = "paquet français " + row["Description"]
+        results.append(row)
+    return json.dumps({"type": "search", "resultcount": rows, "results": results}).encode("utf-8")
+
+
+def decoders(content):
+    """returns name -> function decoding 'content' into Structs"""
+    # the server sends no charset, so requests has to guess it from the body
+    response = Response()
+    response._content = content
+    response.headers["Content-Type"] = "application/json"
+    paths = {
+        "text": lambda: json.loads(response.text, object_hook=Struct),
+        "json": functools.partial(json.loads, content, object_hook=Struct),
+    }
+    if orjson is not None:
+        paths["orjson"] = lambda: _to_structs(orjson.loads(content))
+    return paths
+
+
+def measure(func, repeat):
+    """returns the CPU milliseconds per call of func, best of 'repeat' runs"""
+    best = None
+    for _ in range(repeat):
+        number, start = 0, time.process_time()
+        while number == 0 or time.process_time() - start < 0.2:
+            func()
+            number += 1
+        per_call = (time.process_time() - start) / number * 1000
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.decode",
+                                     description="CPU cost of decoding large RPC responses")
+    parser.add_argument("--rows", type=int, action="append",
+                        help="results per response, may be repeated (100, 1000 and 5000 by default)")
+    parser.add_argument("--payload", type=int, default=64, help="bytes of each package description")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measure, the best is kept")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print("{:>6} {:>10} {:>10} {:>10}".format("rows", "path", "ms/call", "vs text"))
+    for rows in args.rows or (100, 1000, 5000):
+        content = body(rows, args.payload)
+        expected = json.loads(content, object_hook=Struct)
+        timings = {}
+        for name, func in decoders(content).items():
+            assert func() == expected, name
+            timings[name] = measure(func, args.repeat)
+            print("{:>6} {:>10} {:>10.3f} {:>9.2f}x".format(
+                rows, name, timings[name], timings["text"] / timings[name]))
+        results[str(rows)] = {"bytes": len(content), "ms_per_call": timings}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "payload": args.payload, "results": results},
+                      f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
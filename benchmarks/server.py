@@ -0,0 +1,301 @@
+"""A local stand-in for the CCR answering rpc.php, packages.php and pkgsubmit.php
+
+the packages live in memory; votes, flags, notifications, ownership,
+categories, submits and deletes change them like on the real site, so the
+Session checks see the result of their actions
+"""
+
+import contextlib
+import http.server
+import json
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+import ccr.ccr
+import ccr.session
+from ccr.session import CATEGORIES
+
+__all__ = ["MockCCR", "pointed_at"]
+
+# maintainer of the generated packages
+MAINTAINER = "bench"
+_category_names = {number: name for name, number in CATEGORIES.items()}
+
+
+def _package(number, name, maintainer, payload):
+    """returns the RPC row of a generated package - for internal use only"""
+    return {
+        "ID": str(number),
+        "Name": name,
+        "Version": "1.0-1",
+        "CategoryID": "3",
+        "Description": ("mock package " + name).ljust(payload, "."),
+        "URL": "https://example.org/" + name,
+        "URLPath": "/ccr/packages/{}/{}/{}.tar.gz".format(name[:2], name, name),
+        "License": "GPL",
+        "NumVotes": "0",
+        "OutOfDate": "0",
+        "FirstSubmitted": str(1400000000 + number),
+        "LastModified": str(1400000000 + number),
+        "Maintainer": maintainer,
+        "MaintainerUID": "0" if maintainer is None else "1",
+    }
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """routes the requests to the MockCCR - for internal use only"""
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, don't let them wait for an ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body, content_type="text/html", cookies=()):
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for cookie in cookies:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sid(self):
+        match = re.search(r"AURSID=([^;]+)", self.headers.get("Cookie", ""))
+        return match.group(1) if match else None
+
+    def do_GET(self):
+        ccr = self.server.ccr
+        ccr.wait()
+        path, _, query = self.path.partition("?")
+        params = urllib.parse.parse_qs(query)
+        if path.endswith("/rpc.php"):
+            self._reply(json.dumps(ccr.rpc(params)), "application/json")
+        elif path.endswith("/packages.php"):
+            self._reply(ccr.page(params.get("ID", [""])[0], self._sid()))
+        elif path.endswith("/ccr/"):
+            self._reply(ccr.home(self._sid()))
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        ccr = self.server.ccr
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        ccr.wait()
+        path, _, query = self.path.partition("?")
+        if path.endswith("/pkgsubmit.php"):
+            self._reply(ccr.submit(body))
+        elif path.endswith("/packages.php"):
+            form = urllib.parse.parse_qs(body.decode("utf-8"))
+            form.update(urllib.parse.parse_qs(query))
+            self._reply(ccr.action(form, self._sid()))
+        else:
+            form = urllib.parse.parse_qs(body.decode("utf-8"))
+            sid = ccr.login(form.get("user", [""])[0])
+            # "remember me" logins outlive the browser session
+            expiry = "; Max-Age=2592000" if form.get("remember_me") == ["on"] else ""
+            self._reply("", cookies=["AURSID={}; Path=/{}".format(sid, expiry)])
+
+
+class MockCCR(object):
+    """a CCR served from http://127.0.0.1:'port'/ccr/ on a background thread
+    packages: number of generated packages, named pkg00000, pkg00001...;
+    every tenth one is orphaned, the others belong to MAINTAINER
+    latency: seconds every request waits before it is answered
+    payload: minimum size in bytes of each package description
+    search_limit: maximum number of results of a search
+    """
+
+    def __init__(self, packages=1000, latency=0, payload=64, search_limit=50, port=0):
+        self.packages = packages
+        self.latency = latency
+        self.payload = payload
+        self.search_limit = search_limit
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._packages = {}
+        self._names = {}
+        self._sessions = {}
+        self._votes = set()
+        self._notifications = set()
+        for number in range(packages):
+            self.add("pkg{:05d}".format(number), None if number % 10 == 0 else MAINTAINER)
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.ccr = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """the CCR_BASE of this server"""
+        return "http://127.0.0.1:{}/ccr/".format(self._server.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, tb):
+        self.stop()
+
+    def wait(self):
+        """count a request and apply the latency"""
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add(self, name, maintainer=MAINTAINER):
+        """add a package, returns its row"""
+        with self._lock:
+            row = _package(self._next_id, name, maintainer, self.payload)
+            self._next_id += 1
+            self._packages[name] = row
+            self._names[row["ID"]] = name
+            return row
+
+    def get(self, name):
+        """returns the row of package 'name', or None"""
+        return self._packages.get(name)
+
+    def login(self, username):
+        sid = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[sid] = username
+        return sid
+
+    def logout_all(self):
+        """forget every login, as the CCR does when its sessions expire"""
+        with self._lock:
+            self._sessions.clear()
+
+    def home(self, sid):
+        """render the home page, with a logout link for a known login"""
+        with self._lock:
+            username = self._sessions.get(sid)
+        if username is None:
+            return "<form method='post'><input name='user' /><input name='passwd' /></form>"
+        return "Logged-in as: <b>{}</b> <a href='logout.php'>Logout</a>".format(username)
+
+    def rpc(self, params):
+        """answer an rpc.php query"""
+        method = params.get("type", [""])[0]
+        arg = params.get("arg", [""])[0]
+        with self._lock:
+            packages = list(self._packages.values())
+            if method == "info":
+                row = self._packages.get(arg)
+                if row is None:
+                    return {"type": "error", "results": "No result found"}
+                return {"type": "info", "results": dict(row)}
+            if method == "multiinfo":
+                names = params.get("arg[]", [])
+                rows = [dict(self._packages[name]) for name in names if name in self._packages]
+            elif method == "search":
+                rows = [dict(row) for row in packages if arg in row["Name"]][:self.search_limit]
+            elif method == "msearch":
+                # "0" lists the orphans
+                field = "MaintainerUID" if arg == "0" else "Maintainer"
+                rows = [dict(row) for row in packages if row[field] == arg]
+            elif method == "getlatest":
+                rows = [dict(row) for row in packages[::-1][:int(arg or 10)]]
+            else:
+                return {"type": "error", "results": "Incorrect request type specified."}
+        return {"type": method, "resultcount": len(rows), "results": rows}
+
+    def page(self, ccrid, sid):
+        """render the parts of a package page the Session checks"""
+        with self._lock:
+            row = self._packages.get(self._names.get(ccrid))
+            if row is None:
+                return "<p>Error trying to retrieve package details.</p>"
+            username = self._sessions.get(sid)
+            voted = (username, ccrid) in self._votes
+            notified = (username, ccrid) in self._notifications
+            category = _category_names.get(int(row["CategoryID"]), "none")
+        return ("<h2>{name} {version}</h2>\n"
+                "<input type='submit' class='button' name='{vote}' />\n"
+                "<select name='action'><option value='{notify}'>notify</option></select>\n"
+                "<select name='category_id'><option value='{category_id}' selected='selected'>"
+                "{category}</option></select>\n").format(
+                    name=row["Name"], version=row["Version"],
+                    vote="do_UnVote" if voted else "do_Vote",
+                    notify="do_UnNotify" if notified else "do_Notify",
+                    category_id=row["CategoryID"], category=category)
+
+    def action(self, form, sid):
+        """apply a packages.php POST, returns the page of its last package"""
+        ids = [re.match(r"IDs\[(\d+)\]", key).group(1) for key in form if key.startswith("IDs[")]
+        if not ids and "ID" in form:
+            ids = form["ID"]
+        with self._lock:
+            username = self._sessions.get(sid)
+            for ccrid in ids:
+                row = self._packages.get(self._names.get(ccrid))
+                if row is None or username is None:
+                    continue
+                key = (username, ccrid)
+                if "do_Vote" in form and key not in self._votes:
+                    self._votes.add(key)
+                    row["NumVotes"] = str(int(row["NumVotes"]) + 1)
+                elif "do_UnVote" in form and key in self._votes:
+                    self._votes.discard(key)
+                    row["NumVotes"] = str(int(row["NumVotes"]) - 1)
+                elif "do_Flag" in form:
+                    row["OutOfDate"] = "1"
+                elif "do_UnFlag" in form:
+                    row["OutOfDate"] = "0"
+                elif "do_Notify" in form:
+                    self._notifications.add(key)
+                elif "do_UnNotify" in form:
+                    self._notifications.discard(key)
+                elif "do_Adopt" in form and row["MaintainerUID"] == "0":
+                    row["Maintainer"], row["MaintainerUID"] = username, "1"
+                elif "do_Disown" in form and row["Maintainer"] == username:
+                    row["Maintainer"], row["MaintainerUID"] = None, "0"
+                elif "do_Delete" in form:
+                    del self._packages[row["Name"]], self._names[ccrid]
+                elif form.get("action") == ["do_ChangeCategory"]:
+                    row["CategoryID"] = form["category_id"][0]
+        return self.page(ids[-1] if ids else "", sid)
+
+    def submit(self, body):
+        """add the package of a pkgsubmit.php upload"""
+        match = re.search(rb'filename="([^"]+?)(?:\.src)?\.tar\.gz"', body)
+        if match is None:
+            return "<span class='error'>Unknown file format for uploaded file.</span>"
+        name = match.group(1).decode("utf-8").rsplit("/", 1)[-1]
+        self.add(name)
+        return "<a href='pkgbuild_view.php?p={}'>{}</a>".format(name, name)
+
+
+@contextlib.contextmanager
+def pointed_at(base):
+    """make the static functions and Sessions talk to the CCR at 'base'"""
+    urls = {
+        "CCR_BASE": base,
+        "CCR_RPC": base + "rpc.php?type=",
+        "CCR_PKG": base + "packages.php",
+        "CCR_SUBMIT": base + "pkgsubmit.php",
+    }
+    previous = {name: getattr(ccr.ccr, name) for name in urls}
+    for module in (ccr.ccr, ccr.session):
+        for name, value in urls.items():
+            setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module in (ccr.ccr, ccr.session):
+            for name, value in previous.items():
+                setattr(module, name, value)
@@ -0,0 +1,196 @@
+"""The benchmarks: throughput and latency percentiles of the static
+functions, the Session actions and the bulk paths
+"""
+
+import concurrent.futures
+import itertools
+import os
+import platform
+import tempfile
+import threading
+import time
+import ccr
+from ccr.session import Session
+from benchmarks.server import MockCCR, MAINTAINER, pointed_at
+
+__all__ = ["BENCHMARKS", "percentile", "measure", "run", "compare"]
+
+BULK_SIZE = 100
+
+
+def percentile(samples, p):
+    """returns the nearest-rank p-th percentile of sorted 'samples'"""
+    if not samples:
+        return None
+    rank = max(0, int(round(p / 100.0 * len(samples))) - 1)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def measure(operation, args, concurrency=1, setup=None):
+    """call operation(state, arg) for every arg on 'concurrency' threads
+    setup() builds the per-thread state (a Session for instance)
+    returns the summary of the timings in milliseconds
+    """
+    local = threading.local()
+    states = []
+    lock = threading.Lock()
+
+    def timed(arg):
+        if not hasattr(local, "state"):
+            local.state = setup() if setup else None
+            with lock:
+                states.append(local.state)
+        start = time.perf_counter()
+        try:
+            operation(local.state, arg)
+            failed = False
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    args = list(args)
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = list(executor.map(timed, args))
+    elapsed = time.perf_counter() - start
+    for state in states:
+        if hasattr(state, "close"):
+            state.close()
+    samples = sorted(duration * 1000 for duration, _ in timings)
+    return {
+        "ops": len(args),
+        "errors": sum(failed for _, failed in timings),
+        "seconds": elapsed,
+        "throughput": len(args) / elapsed if elapsed else None,
+        "mean": sum(samples) / len(samples) if samples else None,
+        "p50": percentile(samples, 50),
+        "p99": percentile(samples, 99),
+    }
+
+
+def _session():
+    return Session("benchmark", "benchmark")
+
+
+def _names(server, iterations, orphans=False):
+    """distinct packages for 'iterations' operations - for internal use only
+    orphans picks the packages without maintainer
+    """
+    names = ["pkg{:05d}".format(n) for n in range(server.packages)
+             if (n % 10 == 0) == orphans]
+    return list(itertools.islice(itertools.cycle(names), iterations))
+
+
+def _submit(session, path):
+    session.submit(path, "devel")
+
+
+def _bench_submit(server, iterations, concurrency):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for n in range(iterations):
+            path = os.path.join(tmpdir, "submitted{:05d}.src.tar.gz".format(n))
+            with open(path, "wb") as f:
+                f.write(b"\0" * server.payload)
+            paths.append(path)
+        return measure(_submit, paths, concurrency, _session)
+
+
+def _bench_delete(server, iterations, concurrency):
+    names = ["deleted{:05d}".format(n) for n in range(iterations)]
+    for name in names:
+        server.add(name)
+    return measure(lambda session, name: session.delete(name), names, concurrency, _session)
+
+
+def _bench_bulk(action):
+    def bench(server, iterations, concurrency):
+        chunks = [_names(server, BULK_SIZE * (n + 1))[BULK_SIZE * n:] for n in range(iterations)]
+        return measure(lambda session, chunk: session.bulk_action(action, chunk),
+                       chunks, concurrency, _session)
+    return bench
+
+
+def _bench_action(action, *args, orphans=False):
+    def bench(server, iterations, concurrency):
+        return measure(lambda session, name: getattr(session, action)(name, *args),
+                       _names(server, iterations, orphans), concurrency, _session)
+    return bench
+
+
+def _bench_static(func, args):
+    def bench(server, iterations, concurrency):
+        return measure(lambda state, arg: func(arg), args(server, iterations), concurrency)
+    return bench
+
+
+# name -> bench(server, iterations, concurrency); the actions come in pairs
+# undoing each other, so every run starts from the same packages
+BENCHMARKS = [
+    ("info", _bench_static(ccr.info, _names)),
+    ("search", _bench_static(ccr.search, lambda server, n: ["pkg{:03d}".format(i % 1000) for i in range(n)])),
+    ("msearch", _bench_static(ccr.msearch, lambda server, n: [MAINTAINER] * n)),
+    ("info_many", _bench_static(lambda names: ccr.info_many(names),
+                                lambda server, n: [_names(server, BULK_SIZE)] * n)),
+    ("vote", _bench_action("vote")),
+    ("unvote", _bench_action("unvote")),
+    ("flag", _bench_action("flag")),
+    ("unflag", _bench_action("unflag")),
+    ("notify", _bench_action("notify")),
+    ("unnotify", _bench_action("unnotify")),
+    ("adopt", _bench_action("adopt", orphans=True)),
+    ("disown", _bench_action("disown", orphans=True)),
+    ("setcategory", _bench_action("setcategory", "games")),
+    ("submit", _bench_submit),
+    ("delete", _bench_delete),
+    ("bulk_vote", _bench_bulk("vote")),
+    ("bulk_unvote", _bench_bulk("unvote")),
+    ("bulk_flag", _bench_bulk("flag")),
+    ("bulk_unflag", _bench_bulk("unflag")),
+]
+
+
+def run(iterations=100, concurrency=1, latency=0, payload=64, packages=1000, only=None):
+    """run the benchmarks whose names are in 'only' (all by default) against
+    a new MockCCR, returns the results as a JSON serializable dict
+    """
+    settings = {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "latency": latency,
+        "payload": payload,
+        "packages": packages,
+    }
+    results = {}
+    with MockCCR(packages, latency, payload) as server, pointed_at(server.url):
+        for name, bench in BENCHMARKS:
+            if only and name not in only:
+                continue
+            before = server.requests
+            results[name] = bench(server, iterations, concurrency)
+            results[name]["requests"] = server.requests - before
+    return {
+        "version": ccr.__version__,
+        "python": platform.python_version(),
+        "time": time.time(),
+        "settings": settings,
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """compare two run() results
+    returns a list of (benchmark, metric, baseline, current) regressions:
+    throughput dropping or p50/p99 growing by more than 'tolerance'
+    """
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        if before["throughput"] and now["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append((name, "throughput", before["throughput"], now["throughput"]))
+        for metric in ("p50", "p99"):
+            if before[metric] and now[metric] > before[metric] * (1 + tolerance):
+                regressions.append((name, metric, before[metric], now[metric]))
+    return regressions
@@ -1,10 +1,28 @@
+import importlib
+import logging
 from ccr.ccr import *
 from ccr.session import *
 
+# the application decides where the messages of ccr go
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
 __version__ = "0.3.3"
-__all__ = ['search', 'info', 'msearch', 'list_orphans',
+__all__ = ['search', 'iter_search', 'info', 'info_many', 'msearch',
+           'iter_msearch', 'list_orphans', 'Package',
            "latest", "url", "pkg_url", "pkgbuild_url",
            "pkgbuild_raw_url", "file_raw_url",
-           'CCR_BASE', 'CCR_RPC', 'CCR_PKG', 'CCR_SUBMIT',
+           'CCR_BASE', 'CCR_RPC', 'CCR_PKG', 'CCR_SUBMIT', 'set_cache', 'set_offline',
+           'set_transport', 'get_transport', 'set_id_index',
            'Session', 'PackageNotFound', 'InvalidPackage', 'CCRWarning',
+           'VERIFY_STRICT', 'VERIFY_DEFERRED', 'VERIFY_NONE',
 ]
+
+# imported on first access, e.g. ccr.parallel after 'import ccr'
+_SUBMODULES = ("aio", "cache", "cookies", "deps", "download", "fetch", "ids", "instrument",
+               "mirror", "multipart", "parallel", "pool", "ratelimit", "scan", "store", "transport")
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module("ccr." + name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,413 @@
+"""asyncio versions of the CCR static functions and of Session
+
+requires aiohttp
+"""
+
+import asyncio
+import json
+import logging
+import re
+import urllib.parse
+try:
+    import aiohttp
+except ImportError as e:
+    aiohttp = e
+    # Handled in _aiohttp
+from ccr.ccr import (CCR_BASE, CCR_RPC, CCR_PKG, CCR_SUBMIT, ARG, SEARCH,
+                     INFO, MSEARCH, LATEST, Struct, PackageNotFound)
+from ccr.session import (InvalidPackage, CCRWarning, CATEGORIES, _VoteWarning,
+                         _FlagWarning, _DeleteWarning, _NotifyWarning,
+                         _OwnershipWarning, _SubmitWarning, _CategoryWarning)
+
+__all__ = ["search", "info", "msearch", "list_orphans", "latest", "close",
+           "Client", "Session", "PackageNotFound", "InvalidPackage", "CCRWarning"]
+
+_logger = logging.getLogger(__name__)
+
+# maximum number of requests in flight at once
+DEFAULT_CONCURRENCY = 100
+# maximum number of open connections to the CCR host
+DEFAULT_CONNECTIONS = 20
+
+
+def _aiohttp():
+    """returns the aiohttp module - for internal use only
+    raises ImportError if it isn't installed
+    """
+    # Handling this here means the module can still be imported,
+    # even without aiohttp installed.
+    if isinstance(aiohttp, ImportError):
+        raise aiohttp
+    return aiohttp
+
+
+class Client(object):
+    """a pooled set of HTTP connections with a cap on concurrent requests"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, connections=DEFAULT_CONNECTIONS):
+        self._concurrency = concurrency
+        self._connections = connections
+        self._semaphore = None
+        self._connector = None
+        self._http = None
+        self._shared = None
+        self._owner = True
+        self._loop = None
+
+    def fork(self):
+        """returns a client with its own cookies sharing this client's
+        connections and concurrency cap
+        """
+        client = Client(self._concurrency, self._connections)
+        client._shared = self
+        client._owner = False
+        return client
+
+    def _open(self, module, **kwargs):
+        """returns a new HTTP session holding the cookies of the former one,
+        which is let go - for internal use only
+        """
+        jar = module.CookieJar()
+        if self._http is not None:
+            for morsel in self._http.cookie_jar:
+                jar.update_cookies({morsel.key: morsel})
+            # its connections may belong to a previous event loop, which
+            # alone could close them
+            self._http.detach()
+        return module.ClientSession(cookie_jar=jar, **kwargs)
+
+    def _connect(self):
+        """open the HTTP session on first use in the running event loop -
+        for internal use only
+        the objects of a previous event loop can't be used from this one:
+        they are replaced, keeping the cookies
+        """
+        module = _aiohttp()
+        loop = asyncio.get_running_loop()
+        stale = self._loop is not loop
+        self._loop = loop
+        if self._owner:
+            if self._http is None or stale:
+                self._semaphore = asyncio.Semaphore(self._concurrency)
+                self._connector = module.TCPConnector(limit_per_host=self._connections)
+                self._http = self._open(module, connector=self._connector)
+            return self._http
+        self._shared._connect()
+        if self._http is None or stale or self._connector is not self._shared._connector:
+            # the shared connections were closed or belong to another loop
+            self._semaphore = self._shared._semaphore
+            self._connector = self._shared._connector
+            self._http = self._open(module, connector=self._connector, connector_owner=False)
+        return self._http
+
+    @property
+    def cookies(self):
+        """the cookies set for the CCR, as a dict"""
+        if self._http is None:
+            return {}
+        return {name: morsel.value for name, morsel in
+                self._http.cookie_jar.filter_cookies(CCR_BASE).items()}
+
+    async def get_text(self, url):
+        """GET url and return the body as text"""
+        http = self._connect()
+        async with self._semaphore:
+            async with http.get(url) as response:
+                return await response.text()
+
+    async def post_text(self, url, data):
+        """POST data to url and return the body as text"""
+        http = self._connect()
+        async with self._semaphore:
+            async with http.post(url, data=data) as response:
+                return await response.text()
+
+    async def close(self):
+        """close the HTTP session"""
+        if self._http is not None and self._loop is asyncio.get_running_loop():
+            await self._http.close()
+        self._http = self._connector = self._semaphore = self._loop = None
+
+
+_client = None
+
+
+def _default_client():
+    """returns the client shared by the static functions - for internal use only"""
+    global _client
+    if _client is None:
+        _client = Client()
+    return _client
+
+
+async def close():
+    """close the connections shared by the static functions"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def _get_ccr_json(method, arg):
+    """returns the parsed json - for internal use only"""
+    # arg must must be quoted to allow input like 'ls++-git'
+    arg = urllib.parse.quote(arg)
+    text = await _default_client().get_text(CCR_RPC + method + ARG + arg)
+    return json.loads(text, object_hook=Struct)
+
+
+async def search(keywords):
+    """search for some keywords - returns results as a list"""
+    results = await _get_ccr_json(SEARCH, keywords)
+    try:
+        return results.results
+    except KeyError:
+        _logger.debug("Nothing could be found.")
+        raise ValueError(results)
+
+
+async def info(package):
+    """get information for a specific package - returns results as a list"""
+    results = await _get_ccr_json(INFO, package)
+    try:
+        if results.results == u'No result found':
+            _logger.warning("Package couldn't be found")
+            raise PackageNotFound("Package {} couldn't be found".format(package))
+        return results.results
+    except KeyError:
+        _logger.warning("Package couldn't be found")
+        raise PackageNotFound((package, results))
+
+
+async def msearch(maintainer):
+    """search for packages owned by 'maintainer' - returns results as a list"""
+    results = await _get_ccr_json(MSEARCH, maintainer)
+    try:
+        return results.results
+    except KeyError:
+        raise ValueError((maintainer, results))
+
+
+async def list_orphans():
+    """search for orphaned packages - returns results as a list"""
+    return await msearch("0")
+
+
+async def latest(num=10):
+    """get the info for the latest num CCR packages, returns as a list"""
+    return await _get_ccr_json(LATEST, str(num))
+
+
+class Session(object):
+    """class for all CCR actions, see ccr.Session
+
+    use as 'async with Session(username, password) as session:' to log in
+    """
+
+    def __init__(self, username=None, password=None, rememberme=False):
+        self._cat2number = CATEGORIES
+        self._client = _default_client().fork()
+        self._username = username
+        self._password = password
+        self._rememberme = rememberme
+
+    async def __aenter__(self):
+        if self._username and self._password is not None:
+            await self.authenticate(self._username, self._password, self._rememberme)
+        return self
+
+    async def __aexit__(self, type, value, tb):
+        await self.close()
+
+    async def close(self):
+        """end the session"""
+        await self._client.close()
+
+    async def _package_info(self, package):
+        """info() raising PackageNotFound only - for internal use only"""
+        try:
+            return await info(package)
+        except (ValueError, KeyError):
+            raise PackageNotFound(package)
+
+    async def _action(self, ccrid, action):
+        """POST a packages.php action for ccrid - for internal use only"""
+        data = {
+            "IDs[%s]" % ccrid: 1,
+            "ID": ccrid,
+            action: 1,
+        }
+        return await self._client.post_text(CCR_PKG, data)
+
+    async def authenticate(self, username, password, rememberme=False):
+        """authenticate on CCR
+        raises a ValueError if login fails
+        """
+        data = {
+            'user': username,
+            'passwd': password,
+            'remember_me': "on" if rememberme else "off",
+        }
+        await self._client.post_text(CCR_BASE, data)
+
+        if "AURSID" not in self._client.cookies:
+            _logger.debug("There was an error logging in. "
+                          "Please check if username and password are correct")
+            raise ValueError(username, password)
+        self._username = username
+
+    async def check_vote(self, package, return_id=False):
+        """check to see if you have already voted for a package
+        raises a PackageNotFound exception if the package doesn't exist
+        """
+        ccrid = (await self._package_info(package)).ID
+        response = await self._client.get_text(CCR_PKG + "?ID=" + ccrid)
+        voted = "class='button' name='do_UnVote'" in response
+        return (voted, ccrid) if return_id else voted
+
+    async def vote(self, package):
+        """vote for a package on CCR
+        raises a PackageNotFound if the package doesn't exist
+        raises a _VoteWarning if it is already voted or if it couldn't vote
+        """
+        voted, ccrid = await self.check_vote(package, return_id=True)
+        if voted:
+            raise _VoteWarning("Already voted!")
+        await self._action(ccrid, "do_Vote")
+        if not await self.check_vote(package):
+            raise _VoteWarning("Couldn't vote for {}".format(package))
+
+    async def unvote(self, package):
+        """unvote a package on CCR
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _VoteWarning if it is already unvoted or if it couldn't unvote
+        """
+        voted, ccrid = await self.check_vote(package, return_id=True)
+        if not voted:
+            raise _VoteWarning("Already unvoted or never voted!")
+        await self._action(ccrid, "do_UnVote")
+        if await self.check_vote(package):
+            raise _VoteWarning("Couldn't unvote {}".format(package))
+
+    async def flag(self, package):
+        """flag a CCR package as out of date
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _FlagWarning on failure
+        """
+        ccrid = (await self._package_info(package)).ID
+        await self._action(ccrid, "do_Flag")
+        if (await info(package)).OutOfDate == "0":
+            raise _FlagWarning("Couldn't flag {} as out of date".format(package))
+
+    async def unflag(self, package):
+        """unflag a CCR package as out of date
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _FlagWarning on failure
+        """
+        ccrid = (await self._package_info(package)).ID
+        await self._action(ccrid, "do_UnFlag")
+        if (await info(package)).OutOfDate == "1":
+            raise _FlagWarning("Couldn't remove flag for {}".format(package))
+
+    async def notify(self, package):
+        """set the notify flag on a package
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _NotifyWarning on failure
+        """
+        ccrid = (await self._package_info(package)).ID
+        response = await self._action(ccrid, "do_Notify")
+        if "<option value='do_UnNotify'" not in response:
+            raise _NotifyWarning(response)
+
+    async def unnotify(self, package):
+        """unset the notify flag on a package
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _NotifyWarning on failure
+        """
+        ccrid = (await self._package_info(package)).ID
+        response = await self._action(ccrid, "do_UnNotify")
+        if "<option value='do_Notify'" not in response:
+            raise _NotifyWarning(response)
+
+    async def adopt(self, package):
+        """adopt an orphaned CCR package
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _OwnershipWarning if the package is already maintained or if it fails
+        """
+        pkginfo = await self._package_info(package)
+        if pkginfo.MaintainerUID != "0":
+            _logger.warning("Warning: Adopting maintained package!")
+            raise _OwnershipWarning("Couldn't adopt {} : already maintained.".format(package))
+        await self._action(pkginfo.ID, "do_Adopt")
+        if (await self._package_info(package)).Maintainer != self._username:
+            raise _OwnershipWarning("Couldn't adopt {}".format(package))
+
+    async def disown(self, package):
+        """disown a CCR package
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _OwnershipWarning on failure
+        """
+        ccrid = (await self._package_info(package)).ID
+        await self._action(ccrid, "do_Disown")
+        if (await info(package)).MaintainerUID != "0":
+            raise _OwnershipWarning("Couldn't disown {}".format(package))
+
+    async def submit(self, f, category):
+        """submit a package to CCR
+        raises KeyError on bad category
+        raises IOError [Errno 2] if 'f' does not exist
+        raises InvalidPackage if the CCR rejects the package
+        """
+        error = re.compile(r"<span class='error'>(?P<message>.*)</span>")
+        with open(f, "rb") as pfile:
+            data = _aiohttp().FormData()
+            data.add_field("pkgsubmit", "1")
+            data.add_field("category", str(self._cat2number[category]))
+            data.add_field("pfile", pfile)
+            response = await self._client.post_text(CCR_SUBMIT, data)
+
+        error_message = re.search(error, response)
+        if error_message:
+            raise InvalidPackage(error_message.groupdict()["message"])
+        if "pkgbuild_view.php?p=" not in response:
+            raise _SubmitWarning("Couldn't submit {}".format(f))
+
+    async def delete(self, package):
+        """delete a package from CCR
+        raises a PackageNotFound exception if the package doesn't exist
+        raises a _DeleteWarning on failure
+        """
+        ccrid = (await self._package_info(package)).ID
+        data = {
+            "IDs[%s]" % ccrid: 1,
+            "ID": ccrid,
+            "do_Delete": 1,
+            "confirm_Delete": 0,
+        }
+        await self._client.post_text(CCR_PKG, data)
+
+        # test if the package still exists <==> delete wasn't succesful
+        try:
+            await info(package)
+        except PackageNotFound:
+            return
+        raise _DeleteWarning("Couldn't delete {}".format(package))
+
+    async def setcategory(self, package, category):
+        """change/set the category of a package already in the CCR
+        raises a PackageNotFound exception if the package doesn't exist
+        raises _CategoryWarning for an invalid category or if it fails.
+        """
+        ccrid = (await self._package_info(package)).ID
+        try:
+            data = {
+                "action": "do_ChangeCategory",
+                "category_id": self._cat2number[category],
+            }
+        except KeyError:
+            raise _CategoryWarning("Invalid category!")
+
+        response = await self._client.post_text(CCR_PKG + "?ID=" + ccrid, data)
+        checkstr = "selected='selected'>" + category + "</option>"
+        if checkstr not in response:
+            raise _CategoryWarning(response)
@@ -0,0 +1,211 @@
+"""A TTL + LRU cache for the RPC responses
+
+enable it with ccr.set_cache(ResponseCache())
+"""
+
+import collections
+import json
+import sqlite3
+import threading
+import time
+from ccr.ccr import SEARCH, INFO, MSEARCH, LATEST, Struct, _json_default
+
+__all__ = ["ResponseCache", "MemoryBackend", "SQLiteBackend", "DEFAULT_TTLS", "NEGATIVE_TTL"]
+
+# seconds a response stays valid, per RPC method
+DEFAULT_TTLS = {
+    INFO: 600,
+    SEARCH: 300,
+    MSEARCH: 300,
+    LATEST: 30,
+}
+# seconds a reply without results ('No result found') stays valid, as the
+# package may be submitted at any time
+NEGATIVE_TTL = 30
+# methods whose responses list packages
+_LISTINGS = (SEARCH, MSEARCH, LATEST)
+DEFAULT_MAXSIZE = 1024
+
+
+def _negative(value):
+    """tell whether a response has no results - for internal use only"""
+    return isinstance(value, dict) and isinstance(value.get("results"), str)
+
+
+def _lists(value, packages):
+    """tell whether a response lists one of packages, a set - for internal use only"""
+    rows = value.get("results") if isinstance(value, dict) else None
+    if isinstance(rows, dict):
+        rows = [rows]
+    return isinstance(rows, list) and any(isinstance(row, dict) and row.get("Name") in packages
+                                          for row in rows)
+
+
+class MemoryBackend(object):
+    """keeps up to maxsize responses in memory
+    responses are returned as stored, so they must not be modified
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """returns an (expires, value) tuple or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def drop(self, predicate):
+        """delete the entries for which predicate(key, value) is true"""
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend(object):
+    """keeps up to maxsize responses in the sqlite database 'path',
+    so they survive between processes
+    """
+
+    def __init__(self, path, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache (method TEXT, arg TEXT, expires REAL, "
+                          "used REAL, value TEXT, PRIMARY KEY (method, arg))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+        self.conn.commit()
+
+    def get(self, key):
+        """returns an (expires, value) tuple or None"""
+        with self._lock:
+            row = self.conn.execute("SELECT expires, value FROM cache WHERE method=? AND arg=?", key).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE cache SET used=? WHERE method=? AND arg=?", (time.time(),) + key)
+            self.conn.commit()
+        return row[0], json.loads(row[1], object_hook=Struct)
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO cache (method, arg, expires, used, value) VALUES (?,?,?,?,?)",
+                              key + (expires, time.time(), json.dumps(value, default=_json_default)))
+            self.conn.execute("DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY used DESC "
+                              "LIMIT -1 OFFSET ?)", (self.maxsize,))
+            self.conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache WHERE method=? AND arg=?", key)
+            self.conn.commit()
+
+    def drop(self, predicate):
+        """delete the entries for which predicate(key, value) is true"""
+        with self._lock:
+            keys = [(method, arg) for method, arg, value in self.conn.execute("SELECT method, arg, value FROM cache")
+                    if predicate((method, arg), json.loads(value, object_hook=Struct))]
+            self.conn.executemany("DELETE FROM cache WHERE method=? AND arg=?", keys)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class ResponseCache(object):
+    """caches RPC responses keyed on (method, arg)
+    ttls maps RPC methods to the seconds a response stays valid, methods
+    missing from it aren't cached
+    responses without results stay valid for negative_ttl seconds at most,
+    0 doesn't cache them
+    """
+
+    def __init__(self, backend=None, ttls=None, negative_ttl=NEGATIVE_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, method, arg):
+        """returns the cached response or None"""
+        if method not in self.ttls:
+            return None
+        entry = self.backend.get((method, arg))
+        if entry is None or entry[0] < time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, method, arg, value):
+        """cache a response if method is cacheable"""
+        if method not in self.ttls:
+            return
+        ttl = self.ttls[method]
+        if _negative(value):
+            ttl = min(ttl, self.negative_ttl)
+            if ttl <= 0:
+                return
+        self.backend.set((method, arg), value, time.time() + ttl)
+
+    def invalidate(self, package, listed=False):
+        """drop the cached info for package
+        listed=True also drops the search, msearch and latest results
+        listing it, once it was deleted
+        """
+        self.invalidate_many([package], listed)
+
+    def invalidate_many(self, packages, listed=False):
+        """invalidate several packages, looking for their listings at once"""
+        packages = set(packages)
+        for package in packages:
+            self.backend.delete((INFO, package))
+        if listed and packages:
+            self.backend.drop(lambda key, value: key[0] in _LISTINGS and _lists(value, packages))
+
+    def invalidate_missing(self):
+        """drop the responses that may miss a newly submitted package: the
+        replies without results and every search, msearch and latest result
+        """
+        self.backend.drop(lambda key, value: key[0] in _LISTINGS or _negative(value))
+
+    def clear(self):
+        """drop every cached response and reset the counters"""
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """returns the hit/miss counters and the number of cached responses"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.backend)}
@@ -2,34 +2,60 @@
 
 from __future__ import print_function
 
-__all__ = ["search", "info", "msearch", "list_orphans",
+__all__ = ["search", "iter_search", "info", "info_many", "msearch",
+           "iter_msearch", "list_orphans",
            "latest", "url", "pkg_url", "pkgbuild_url",
            "pkgbuild_raw_url", "file_raw_url",
            "CCR_BASE", "CCR_RPC", "CCR_PKG", "CCR_SUBMIT",
-           "PackageNotFound",
+           "PackageNotFound", "Package", "set_cache", "set_offline",
+           "set_transport", "get_transport", "set_id_index",
            ]
 
+import codecs
 import contextlib
-import requests
+import concurrent.futures
+import functools
 import urllib.parse
 import json
 import logging
+import threading
+import time
+from ccr import instrument
 
-logging.basicConfig(level=logging.ERROR, format='>> %(levelname)s - %(message)s')
+_logger = logging.getLogger(__name__)
 
 CCR_BASE = "https://chakralinux.org/ccr/"
 CCR_RPC = CCR_BASE + "rpc.php?type="
 CCR_PKG = CCR_BASE + "packages.php"
 CCR_SUBMIT = CCR_BASE + "pkgsubmit.php"
 ARG = "&arg="
+MULTIARG = "&arg[]="
 SEARCH = "search"
 INFO = "info"
+MULTIINFO = "multiinfo"
 MSEARCH = "msearch"
 LATEST = "getlatest"
-
-
-# session
-session = requests.Session()
+# number of packages sent in a single multiinfo query
+MULTIINFO_CHUNK = 100
+# bytes read at once when streaming results
+STREAM_CHUNK = 16 * 1024
+# streamed rows recorded in the ID index at once
+ID_BATCH = 100
+
+
+# HTTP settings of session and of new Sessions, see set_transport; both
+# are created on first use so that importing ccr doesn't import requests
+_transport = None
+_lazy_lock = threading.Lock()
+# response cache, see set_cache
+_cache = None
+# local mirror answering queries offline, see set_offline
+_mirror = None
+# package name -> ID index, see set_id_index
+_ids = None
+# JSON decoder of the responses, picked on first use by _decode
+_loads = None
+_CONTAINERS = (dict, list)
 
 
 class PackageNotFound(ValueError):
@@ -48,50 +74,600 @@ class Struct(dict):
         del self[name]
 
 
+class _MissingField(KeyError, AttributeError):
+    """a Package has no such field - caught like a Struct's KeyError"""
+
+
+class Package(object):
+    """a result row with a slot for every known CCR field, a fraction of the
+    size of a Struct
+    fields are read like on a Struct (package.Name or package["Name"]) and
+    keep the raw values sent by the server; the numeric fields are converted
+    on access through their lowercase names (package.num_votes)
+    """
+    FIELDS = ("ID", "Name", "Version", "CategoryID", "Description", "URL",
+              "URLPath", "License", "NumVotes", "OutOfDate", "FirstSubmitted",
+              "LastModified", "Maintainer", "MaintainerUID")
+    # converted attribute -> raw field
+    NUMERIC = {
+        "id": "ID",
+        "category_id": "CategoryID",
+        "num_votes": "NumVotes",
+        "out_of_date": "OutOfDate",
+        "first_submitted": "FirstSubmitted",
+        "last_modified": "LastModified",
+        "maintainer_uid": "MaintainerUID",
+    }
+    # fields the server sent that aren't in FIELDS are kept in _extra
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, row=()):
+        object.__setattr__(self, "_extra", None)
+        for name, value in (row.items() if hasattr(row, "items") else row):
+            self.__setattr__(name, value)
+
+    def __getattr__(self, name):
+        # only called for unset slots and unknown fields
+        if name == "_extra":
+            raise AttributeError(name)
+        if self._extra is not None and name in self._extra:
+            return self._extra[name]
+        raise _MissingField(name)
+
+    def __setattr__(self, name, value):
+        if name in Package.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            if self._extra is None:
+                object.__setattr__(self, "_extra", {})
+            self._extra[name] = value
+
+    def __delattr__(self, name):
+        if name in Package.__slots__:
+            object.__delattr__(self, name)
+        else:
+            del self._extra[name]
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __repr__(self):
+        return "Package({!r})".format(dict(self.items()))
+
+    def get(self, name, default=None):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            return default
+
+    def keys(self):
+        keys = [name for name in Package.FIELDS if hasattr(self, name)]
+        return keys + list(self._extra or ())
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+
+def _numeric_field(field):
+    """returns a property converting field to int - for internal use only"""
+    return property(lambda self: int(getattr(self, field)),
+                    doc="{} as an int".format(field))
+
+
+for _attribute, _field in Package.NUMERIC.items():
+    setattr(Package, _attribute, _numeric_field(_field))
+
+
+def _json_default(value):
+    """json.dumps default serializing Packages like Structs - for internal use only"""
+    if isinstance(value, Package):
+        return dict(value.items())
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+def _as_record(results, record):
+    """convert a row or a list of rows to the record type - for internal use only"""
+    if record is Struct:
+        return results
+    if isinstance(results, list):
+        return [record(row) for row in results]
+    if isinstance(results, dict):
+        return record(results)
+    return results
+
+
+class _JSONStream(object):
+    """incrementally decodes JSON values from an iterable of byte chunks - for internal use only"""
+
+    def __init__(self, chunks, decoder):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = decoder
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read(self):
+        """append the next chunk to the buffer, returns False at the end"""
+        if self._eof:
+            return False
+        # drop what was already decoded so the buffer stays small
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        try:
+            self._buffer += self._utf8.decode(next(self._chunks))
+        except StopIteration:
+            self._buffer += self._utf8.decode(b"", final=True)
+            self._eof = True
+        return True
+
+    def peek(self):
+        """returns the next non-whitespace character without consuming it, "" at the end"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._read():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, char):
+        """consume char, raises ValueError if something else comes next"""
+        if self.peek() != char:
+            raise ValueError("Expected {!r} at {!r}".format(char, self._buffer[self._pos:self._pos + 20]))
+        self._pos += 1
+
+    def value(self):
+        """decode and consume the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if not self._read():
+                    raise
+                continue
+            # a number at the very end of the buffer may be cut in half
+            if end < len(self._buffer) or self._eof:
+                self._pos = end
+                return value
+            self._read()
+
+
+def _iter_results(chunks, decoder):
+    """yield the rows of the "results" member of a JSON response read from
+    byte chunks - for internal use only
+    raises ValueError if the response has no results
+    """
+    stream = _JSONStream(chunks, decoder)
+    stream.expect("{")
+    while stream.peek() != "}":
+        key = stream.value()
+        stream.expect(":")
+        if key != "results":
+            stream.value()
+        elif stream.peek() != "[":
+            results = stream.value()
+            # a single row or a message like 'No result found'
+            if isinstance(results, str):
+                _logger.debug(results)
+            else:
+                yield results
+            return
+        else:
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield stream.value()
+                if stream.peek() == ",":
+                    stream.expect(",")
+            return
+        if stream.peek() == ",":
+            stream.expect(",")
+    raise ValueError("No results in the response")
+
+
+class _SingleFlight(object):
+    """lets concurrent identical calls share one execution - for internal use only"""
+
+    class _Call(object):
+        __slots__ = ("done", "result", "error")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """returns func(), or the result of the func() already running for key;
+        raises its exception the same way
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+# RPC calls in flight, shared by identical concurrent queries
+_flights = _SingleFlight()
+
+
+def set_transport(transport):
+    """use 'transport', a ccr.transport.Transport, for the static functions
+    and the Sessions created from now on
+    """
+    global _transport
+    _transport = transport
+    if "session" in globals():
+        transport.mount(session)
+
+
+def get_transport():
+    """returns the current ccr.transport.Transport"""
+    global _transport
+    if _transport is None:
+        from ccr.transport import Transport
+        with _lazy_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
+
+
+def _get_session():
+    """returns the requests session of the static functions, created on
+    first use - for internal use only
+    """
+    global session
+    if "session" not in globals():
+        transport = get_transport()
+        with _lazy_lock:
+            if "session" not in globals():
+                session = transport.session()
+    return session
+
+
+def __getattr__(name):
+    # ccr.ccr.session is created on first access, see _get_session
+    if name == "session":
+        return _get_session()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def set_cache(cache):
+    """cache the RPC responses in 'cache', a ccr.cache.ResponseCache
+    None disables caching
+    """
+    global _cache
+    _cache = cache
+
+
+def set_offline(mirror):
+    """answer info, search and msearch from 'mirror', a ccr.mirror.Mirror,
+    instead of the CCR - None goes back online
+    every one of these functions can also be told offline=True/False per call
+    """
+    global _mirror
+    _mirror = mirror
+
+
+def set_id_index(index):
+    """record the package IDs seen in the RPC results in 'index', a
+    ccr.ids.IdIndex, and take the IDs the Session actions and url() need
+    from it instead of querying info - None disables the index
+    """
+    global _ids
+    _ids = index
+
+
+def _offline_mirror(offline):
+    """returns the mirror to answer from, or None to query the CCR - for internal use only"""
+    if offline is None:
+        return _mirror
+    if not offline:
+        return None
+    if _mirror is None:
+        raise ValueError("No mirror to answer offline queries, see set_offline")
+    return _mirror
+
+
+def _invalidate_cache(*packages, listed=False):
+    """drop the cached info for packages, see ResponseCache.invalidate - for
+    internal use only
+    """
+    if _cache is not None:
+        _cache.invalidate_many(packages, listed)
+
+
+def _invalidate_missing():
+    """drop the cached responses a submit may change - for internal use only"""
+    if _cache is not None:
+        _cache.invalidate_missing()
+
+
+def _id_pairs(rows):
+    """returns the (name, ID) pairs of result rows - for internal use only"""
+    return [(row["Name"], row["ID"]) for row in rows
+            if isinstance(row, (dict, Package)) and "Name" in row and "ID" in row]
+
+
+def _index_ids(results):
+    """record the IDs of the packages in an RPC response - for internal use only"""
+    rows = results.get("results") if isinstance(results, dict) else None
+    _index_rows(rows)
+
+
+def _index_rows(rows):
+    """record the IDs of a result row or a list of them, if there is an ID
+    index - for internal use only
+    """
+    if _ids is None:
+        return
+    if isinstance(rows, (dict, Package)):
+        rows = [rows]
+    if isinstance(rows, list):
+        _ids.update(_id_pairs(rows))
+
+
+def _indexed_id(package):
+    """returns the CCR ID of package from the ID index, None if it isn't
+    there - for internal use only
+    """
+    return _ids.get(package) if _ids is not None else None
+
+
+def _forget_id(package):
+    """drop the indexed ID of package, deleted or stale - for internal use only"""
+    if _ids is not None:
+        _ids.forget(package)
+
+
 #CCR static functions
-def _get_ccr_json(method, arg):
-    """returns the parsed json - for internal use only"""
+def _rpc_url(method, arg):
+    """returns the RPC url of a query - for internal use only
+    arg is either a single string or a list of strings for multi-arg queries
+    """
     # arg must must be quoted to allow input like 'ls++-git'
-    arg = urllib.parse.quote(arg)
-    with contextlib.closing(session.get(CCR_RPC + method + ARG + arg)) as results:
-        return json.loads(results.text, object_hook=Struct)
+    if isinstance(arg, str):
+        return CCR_RPC + method + ARG + urllib.parse.quote(arg)
+    return CCR_RPC + method + "".join(MULTIARG + urllib.parse.quote(a) for a in arg)
+
+
+def _iter_ccr_json(method, arg, record):
+    """yield the result rows as they are read from the network - for internal use only"""
+    if record is Struct:
+        decoder = json.JSONDecoder(object_hook=Struct)
+    else:
+        decoder = json.JSONDecoder(object_pairs_hook=record)
+    pending = []
+    try:
+        with contextlib.closing(_get_session().get(_rpc_url(method, arg), stream=True)) as results:
+            for row in _iter_results(results.iter_content(STREAM_CHUNK), decoder):
+                # the ID index is fed in batches, not a write per row
+                if _ids is not None:
+                    pending.append(row)
+                    if len(pending) >= ID_BATCH:
+                        _index_rows(pending)
+                        pending = []
+                yield row
+    finally:
+        _index_rows(pending)
+
+
+def _to_structs(value):
+    """turn the dicts of a decoded response into Structs - for internal use only"""
+    if type(value) is list:
+        return [_to_structs(item) if type(item) in _CONTAINERS else item for item in value]
+    if type(value) is not dict:
+        return value
+    struct = Struct(value)
+    for key, item in value.items():
+        if type(item) in _CONTAINERS:
+            struct[key] = _to_structs(item)
+    return struct
+
+
+def _decode(content):
+    """decode the bytes of an RPC response into Structs - for internal use only
+    the body is parsed as UTF-8 JSON, with orjson when it is installed
+    raises ValueError on invalid JSON
+    """
+    global _loads
+    if _loads is None:
+        try:
+            import orjson
+        except ImportError:
+            _loads = functools.partial(json.loads, object_hook=Struct)
+        else:
+            _loads = lambda content: _to_structs(orjson.loads(content))
+    return _loads(content)
 
 
-def search(keywords):
-    """search for some keywords - returns results as a list"""
+def _get_ccr_json(method, arg):
+    """returns the parsed json - for internal use only
+    arg is either a single string or a list of strings for multi-arg queries
+    concurrent calls with the same method and arg share one request and
+    its parsed result, which must therefore not be modified
+    """
+    cacheable = _cache is not None and isinstance(arg, str)
+    if cacheable:
+        results = _cache.get(method, arg)
+        if results is not None:
+            return results
+
+    def fetch():
+        url = _rpc_url(method, arg)
+        with instrument.timed("rpc", method, arg, url) as event:
+            with contextlib.closing(_get_session().get(url)) as response:
+                content = response.content
+            if event is None:
+                results = _decode(content)
+            else:
+                event.record(response)
+                start = time.perf_counter()
+                results = _decode(content)
+                event.parse = time.perf_counter() - start
+        if _ids is not None:
+            _index_ids(results)
+        if cacheable:
+            _cache.set(method, arg, results)
+        return results
+    key = (method, arg if isinstance(arg, str) else tuple(arg))
+    return _flights.do(key, fetch)
+
+
+def search(keywords, offline=None, record=Struct):
+    """search for some keywords - returns results as a list
+    record=Package returns compact Package rows instead of Structs
+    """
+    mirror = _offline_mirror(offline)
+    if mirror is not None:
+        results = mirror.search(keywords)
+        _index_rows(results)
+        return _as_record(results, record)
     results = _get_ccr_json(SEARCH, keywords)
     try:
-        return results.results
+        return _as_record(results.results, record)
     except KeyError:
-        logging.debug("Nothing could be found.")
+        _logger.debug("Nothing could be found.")
         raise ValueError(results)
 
 
-def info(package):
-    """get information for a specific package - returns results as a list"""
+def iter_search(keywords, record=Struct):
+    """search for some keywords - yields the results one by one while they
+    are read from the network, without holding the whole response in memory
+    record=Package yields compact Package rows instead of Structs
+    raises ValueError if data returned from server are invalid
+    """
+    return _iter_ccr_json(SEARCH, keywords, record)
+
+
+def info(package, offline=None, record=Struct):
+    """get information for a specific package - returns results as a list
+    record=Package returns a compact Package instead of a Struct
+    """
+    mirror = _offline_mirror(offline)
+    if mirror is not None:
+        results = mirror.info(package)
+        _index_rows(results)
+        return _as_record(results, record)
     results = _get_ccr_json(INFO, package)
     try:
         if results.results == u'No result found':
-            logging.warning("Package couldn't be found")
+            _logger.warning("Package couldn't be found")
             raise PackageNotFound("Package {} couldn't be found".format(package))
-        return results.results
+        return _as_record(results.results, record)
     except KeyError:
-        logging.warning("Package couldn't be found")
+        _logger.warning("Package couldn't be found")
         raise PackageNotFound((package, results))
 
 
-def msearch(maintainer):
-    """search for packages owned by 'maintainer' - returns results as a list"""
+def _info_or_none(package):
+    """like info, but always online and returning None for a missing
+    package - for internal use only
+    """
+    try:
+        return info(package, offline=False)
+    except PackageNotFound:
+        return None
+
+
+def _multiinfo(packages):
+    """query several packages at once - for internal use only
+    returns None if the server doesn't support multiinfo queries
+    """
+    results = _get_ccr_json(MULTIINFO, packages)
+    try:
+        rows = results.results
+    except KeyError:
+        return None
+    if isinstance(rows, str):
+        # 'No result found' only means that none of the chunk exists
+        if results.get("type") == "error" and rows != u'No result found':
+            return None
+        return []
+    # a single hit may come back as a bare object instead of a list
+    return [rows] if isinstance(rows, dict) else rows
+
+
+def info_many(packages, chunk_size=MULTIINFO_CHUNK, workers=4):
+    """get information for many packages at once
+    packages are sent to the server in chunks of 'chunk_size'; if the server
+    doesn't support multiinfo queries, falls back to 'workers' parallel info calls
+    returns a (found, missing) tuple: a dict mapping package names to their
+    results and a list of the packages that couldn't be found
+    """
+    names = list(dict.fromkeys(packages))
+    found = {}
+    for start in range(0, len(names), chunk_size):
+        rows = _multiinfo(names[start:start + chunk_size])
+        if rows is None:
+            _logger.debug("multiinfo is not supported, querying packages one by one")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                for name, result in zip(names[start:], executor.map(_info_or_none, names[start:])):
+                    if result is not None:
+                        found[name] = result
+            break
+        for row in rows:
+            found[row.Name] = row
+    missing = [name for name in names if name not in found]
+    return found, missing
+
+
+def msearch(maintainer, offline=None, record=Struct):
+    """search for packages owned by 'maintainer' - returns results as a list
+    record=Package returns compact Package rows instead of Structs
+    """
+    mirror = _offline_mirror(offline)
+    if mirror is not None:
+        results = mirror.msearch(maintainer)
+        _index_rows(results)
+        return _as_record(results, record)
     results = _get_ccr_json(MSEARCH, maintainer)
     try:
-        return results.results
+        return _as_record(results.results, record)
     except KeyError:
         raise ValueError((maintainer, results))
 
 
-def list_orphans():
+def iter_msearch(maintainer, record=Struct):
+    """search for packages owned by 'maintainer' - yields the results one by
+    one, see iter_search
+    """
+    return _iter_ccr_json(MSEARCH, maintainer, record)
+
+
+def list_orphans(offline=None):
     """search for orphaned packages - returns results as a list"""
-    return msearch("0")
+    return msearch("0", offline)
 
 
 def latest(num=10):
@@ -102,7 +678,7 @@ def latest(num=10):
 def url(package):
     """get the URL of the package's CCR page"""
     try:
-        ccrid = info(package).ID
+        ccrid = _indexed_id(package) or info(package).ID
     except KeyError:
         raise ValueError(package)
     url = CCR_PKG + "?ID=" + ccrid
@@ -0,0 +1,94 @@
+"""Keep the login cookies of a Session between processes
+
+Session(username, password, cookies=store) reuses the AURSID cookie saved
+in 'store' while the CCR accepts it and only logs in again once it has
+expired; 'store' is a CookieFile or one of the ccrauth backends (AuthFile,
+AuthDB)
+"""
+
+import json
+import os
+import time
+
+__all__ = ["CookieFile", "SESSION_TIMEOUT", "EXPIRY_MARGIN"]
+
+# seconds the CCR keeps a login without "remember me", whose cookie has no expiry
+SESSION_TIMEOUT = 2 * 60 * 60
+# cookies expiring within this many seconds are treated as expired
+EXPIRY_MARGIN = 60
+
+
+def _record(jar, username, saved=None):
+    """returns the JSON serializable record of the cookies in 'jar'
+    saved is when the login was made, now by default; cookies without an
+    expiry are taken to last SESSION_TIMEOUT from then - for internal use only
+    """
+    cookies = [{
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path,
+        "expires": cookie.expires,
+        "secure": cookie.secure,
+    } for cookie in jar]
+    return {"username": username, "saved": time.time() if saved is None else saved, "cookies": cookies}
+
+
+def _expires(cookie, record):
+    """returns when a recorded cookie expires - for internal use only"""
+    if cookie["expires"] is None:
+        return record["saved"] + SESSION_TIMEOUT
+    return cookie["expires"]
+
+
+def _valid(record, username):
+    """tell whether a record holds a live login of 'username', without
+    asking the CCR - for internal use only
+    """
+    if not record or (username and record.get("username") != username):
+        return False
+    deadline = time.time() + EXPIRY_MARGIN
+    return any(cookie["name"] == "AURSID" and _expires(cookie, record) > deadline
+               for cookie in record.get("cookies", ()))
+
+
+def _restore(jar, record, username):
+    """put the cookies of a valid record back into 'jar'
+    returns False, leaving jar untouched, if the record isn't valid - for
+    internal use only
+    """
+    if not _valid(record, username):
+        return False
+    now = time.time()
+    for cookie in record["cookies"]:
+        if _expires(cookie, record) > now:
+            jar.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                    expires=cookie["expires"], secure=cookie["secure"])
+    return True
+
+
+class CookieFile(object):
+    """keeps the login cookies in the JSON file 'path'"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load_cookies(self):
+        """returns the saved cookies, None if there are none"""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store_cookies(self, record):
+        """save the cookies, readable by their owner only"""
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+
+    def delete_cookies(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
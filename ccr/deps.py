@@ -0,0 +1,170 @@
+"""Dependency graph of CCR packages
+
+PKGBUILDs are fetched in parallel and parsed statically, without running
+bash, on a process pool
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import re
+import shlex
+import ccr.ccr
+import ccr.parallel
+from ccr.ccr import pkgbuild_raw_url
+
+__all__ = ["parse_pkgbuild", "parse_many", "DependencyGraph"]
+
+ARRAYS = ("depends", "makedepends", "provides", "conflicts")
+_ARRAY = re.compile(r"^\s*(?P<name>" + "|".join(ARRAYS) + r")\+?=\((?P<body>.*?)\)", re.M | re.S)
+_VERSION = re.compile(r"[<>=].*$")
+
+
+def parse_pkgbuild(text):
+    """returns a dict with the depends, makedepends, provides and conflicts
+    arrays of a PKGBUILD, versions constraints stripped
+    """
+    parsed = {name: [] for name in ARRAYS}
+    for match in _ARRAY.finditer(text):
+        try:
+            words = shlex.split(match.group("body"), comments=True)
+        except ValueError:
+            # unbalanced quotes, keep what can be read
+            words = match.group("body").split()
+        parsed[match.group("name")].extend(_VERSION.sub("", word) for word in words if word)
+    return parsed
+
+
+def parse_many(texts, processes=None):
+    """parse_pkgbuild every text on a pool of 'processes' processes
+    returns a list of results, in order
+    """
+    texts = list(texts)
+    if len(texts) < 2:
+        return [parse_pkgbuild(text) for text in texts]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(parse_pkgbuild, texts, chunksize=max(1, len(texts) // 64)))
+
+
+def _fetch_pkgbuild(package, store=None, modified=None):
+    """returns the PKGBUILD of package as text, the copy in store only if it
+    was kept for the upload made at LastModified 'modified' - for internal
+    use only
+    """
+    if store is not None:
+        if modified is None:
+            data = store.get_pkgbuild(package, refresh=True)
+        else:
+            data = store.get_pkgbuild(package, str(modified))
+    else:
+        with contextlib.closing(ccr.ccr.session.get(pkgbuild_raw_url(package))) as response:
+            response.raise_for_status()
+            data = response.content
+    return bytes(data).decode("utf-8", "replace")
+
+
+class DependencyGraph(object):
+    """dependencies between CCR packages
+    only dependencies on other CCR packages (or what they provide) are
+    edges, dependencies on the official repositories are ignored
+    """
+
+    def __init__(self):
+        # package -> parse_pkgbuild result
+        self.packages = {}
+        # package -> LastModified of the parsed PKGBUILD
+        self.modified = {}
+        self._forward = None
+        self._reverse = None
+
+    def add(self, package, parsed, modified=None):
+        """add or replace package with its parse_pkgbuild result"""
+        self.packages[package] = parsed
+        self.modified[package] = modified
+        self._forward = self._reverse = None
+
+    def remove(self, package):
+        """forget package"""
+        self.packages.pop(package, None)
+        self.modified.pop(package, None)
+        self._forward = self._reverse = None
+
+    def update(self, packages, store=None, workers=ccr.parallel.DEFAULT_WORKERS, processes=None):
+        """fetch and parse the PKGBUILDs of packages, a list of CCR results,
+        whose LastModified changed since they were last parsed
+        store is a ccr.store.Store to fetch the PKGBUILDs through
+        returns a dict mapping the packages that couldn't be fetched to the error
+        """
+        changed = {package.Name: package.get("LastModified") for package in packages
+                   if package.Name not in self.packages or self.modified[package.Name] != package.get("LastModified")}
+        texts = {}
+        errors = {}
+        for name, text in ccr.parallel._run(lambda name: _fetch_pkgbuild(name, store, changed[name]), changed,
+                                            workers, False, True):
+            if isinstance(text, Exception):
+                errors[name] = text
+            else:
+                texts[name] = text
+        names = list(texts)
+        for name, parsed in zip(names, parse_many([texts[name] for name in names], processes)):
+            self.add(name, parsed, changed[name])
+        return errors
+
+    def _index(self):
+        """build the adjacency index - for internal use only"""
+        providers = collections.defaultdict(set)
+        for package, parsed in self.packages.items():
+            for provided in parsed["provides"]:
+                providers[provided].add(package)
+        forward = {}
+        reverse = collections.defaultdict(set)
+        for package, parsed in self.packages.items():
+            edges = set()
+            for dep in parsed["depends"] + parsed["makedepends"]:
+                edges |= {dep} if dep in self.packages else providers.get(dep, set())
+            edges.discard(package)
+            forward[package] = edges
+            for dep in edges:
+                reverse[dep].add(package)
+        self._forward, self._reverse = forward, dict(reverse)
+
+    def depends_on(self, package):
+        """returns the CCR packages package (make)depends on"""
+        if self._forward is None:
+            self._index()
+        return set(self._forward.get(package, ()))
+
+    def required_by(self, package):
+        """returns the CCR packages that (make)depend on package"""
+        if self._reverse is None:
+            self._index()
+        return set(self._reverse.get(package, ()))
+
+    def build_order(self, packages=None):
+        """returns packages (all of them if None) and the CCR packages they
+        depend on in an order where every package comes after its dependencies
+        raises ValueError if dependencies are circular
+        """
+        if self._forward is None:
+            self._index()
+        wanted = set(self.packages if packages is None else packages)
+        todo = list(wanted)
+        while todo:
+            for dep in self._forward.get(todo.pop(), ()):
+                if dep not in wanted:
+                    wanted.add(dep)
+                    todo.append(dep)
+        missing = {package: len(self._forward.get(package, set()) & wanted) for package in wanted}
+        ready = sorted(package for package, count in missing.items() if count == 0)
+        order = []
+        while ready:
+            package = ready.pop()
+            order.append(package)
+            for dependent in sorted(self._reverse.get(package, ()), reverse=True):
+                if dependent in missing:
+                    missing[dependent] -= 1
+                    if missing[dependent] == 0:
+                        ready.append(dependent)
+        if len(order) < len(wanted):
+            raise ValueError("Circular dependencies between {}".format(sorted(wanted - set(order))))
+        return order
@@ -0,0 +1,142 @@
+"""Parallel downloads of source packages
+
+files are streamed to disk in fixed-size chunks, interrupted downloads are
+resumed with HTTP Range requests, only while the file keeps the ETag or
+Last-Modified it had, and checksums are verified before a file is moved
+into place
+"""
+
+import contextlib
+import hashlib
+import os
+import threading
+import time
+import ccr.ccr
+import ccr.parallel
+from ccr.ccr import pkg_url
+from ccr.fetch import _load_validators, _save_validators, VALIDATORS_SUFFIX
+
+__all__ = ["Bandwidth", "ChecksumMismatch", "download", "download_many"]
+
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+
+class ChecksumMismatch(ValueError):
+    """The downloaded file doesn't match its checksum"""
+
+
+class Bandwidth(object):
+    """a token bucket limiting the downloads sharing it to 'rate' bytes per second"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._allowance = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        """account for nbytes, sleeping as long as the limit requires"""
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            self._allowance -= nbytes
+            wait = -self._allowance / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _hash_file(path, algorithm):
+    """returns a hash object fed with the contents of path - for internal use only"""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _if_range(validators):
+    """returns the If-Range value resuming a partial download, None if it
+    can't be resumed safely - for internal use only
+    """
+    etag = validators.get("ETag")
+    # If-Range only takes strong ETags
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("Last-Modified")
+
+
+def _discard(part):
+    """remove a partial download and its validators - for internal use only"""
+    for name in (part, part + VALIDATORS_SUFFIX):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(name)
+
+
+def download(url, path, checksum=None, algorithm="sha256", bandwidth=None):
+    """download url to path, resuming a previous interrupted download
+    checksum is the expected hex digest of the file; a file already at path
+    matching it isn't downloaded again
+    bandwidth is a Bandwidth shared with other downloads
+    returns path
+    raises ChecksumMismatch if the downloaded file doesn't match checksum
+    raises a requests.HTTPError if the server answers with an error
+    raises a ConnectionError if a network error occur
+    """
+    if checksum is not None and os.path.exists(path):
+        if _hash_file(path, algorithm).hexdigest() == checksum.lower():
+            return path
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    part = path + PART_SUFFIX
+    while True:
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        # a partial file is only resumed if it is still the same file on the
+        # server, the package URL being overwritten on every update
+        validator = _if_range(_load_validators(part)) if offset else None
+        headers = {"Range": "bytes={}-".format(offset), "If-Range": validator} if validator else {}
+        with contextlib.closing(ccr.ccr.session.get(url, headers=headers, stream=True)) as response:
+            if validator and response.status_code == 416:
+                # the file shrank, start over
+                _discard(part)
+                continue
+            response.raise_for_status()
+            # 200: the file changed or the server ignored the range
+            resumed = validator is not None and response.status_code == 206
+            if not resumed:
+                _save_validators(part, response.headers)
+            with open(part, "ab" if resumed else "wb") as file:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    file.write(chunk)
+                    if bandwidth is not None:
+                        bandwidth.consume(len(chunk))
+        break
+
+    if checksum is not None:
+        digest = _hash_file(part, algorithm).hexdigest()
+        if digest != checksum.lower():
+            _discard(part)
+            raise ChecksumMismatch("{}: expected {}, got {}".format(url, checksum, digest))
+    os.replace(part, path)
+    _discard(part)
+    return path
+
+
+def download_many(packages, directory, checksums=None, algorithm="sha256",
+                  workers=ccr.parallel.DEFAULT_WORKERS, rate=None):
+    """download the source packages of packages to directory concurrently
+    checksums maps packages to their expected hex digest
+    rate limits the total bandwidth to that many bytes per second
+    yields (package, path) pairs as they complete, with the error in place of
+    the path if a download failed
+    """
+    checksums = checksums or {}
+    bandwidth = Bandwidth(rate) if rate else None
+
+    def fetch(package):
+        return download(pkg_url(package), os.path.join(directory, package + ".tar.gz"),
+                        checksums.get(package), algorithm, bandwidth)
+    return ccr.parallel._run(fetch, packages, workers, False, True)
@@ -0,0 +1,93 @@
+"""Conditional downloads of PKGBUILDs and source packages
+
+the ETag and Last-Modified validators of every download are stored next to
+the local copy, so fetching it again only transfers the body if it changed
+"""
+
+import collections
+import contextlib
+import json
+import os
+import ccr.ccr
+import ccr.parallel
+from ccr.ccr import pkg_url, pkgbuild_raw_url
+
+__all__ = ["FetchResult", "fetch", "fetch_pkgbuild", "fetch_pkg", "fetch_many"]
+
+CHUNK_SIZE = 64 * 1024
+VALIDATORS_SUFFIX = ".validators"
+
+# path: local copy, modified: False if the server answered 304 Not Modified
+FetchResult = collections.namedtuple("FetchResult", ["path", "modified", "status"])
+
+
+def _load_validators(path):
+    """returns the validators saved for path - for internal use only"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path + VALIDATORS_SUFFIX) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_validators(path, headers):
+    """save the validators of a response for path - for internal use only"""
+    validators = {name: headers[name] for name in ("ETag", "Last-Modified") if name in headers}
+    with open(path + VALIDATORS_SUFFIX, "w") as file:
+        json.dump(validators, file)
+
+
+def fetch(url, path):
+    """download url to path, unless it didn't change since the last fetch
+    returns a FetchResult
+    raises a requests.HTTPError if the server answers with an error
+    raises a ConnectionError if a network error occur
+    """
+    validators = _load_validators(path)
+    headers = {}
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+
+    with contextlib.closing(ccr.ccr.session.get(url, headers=headers, stream=True)) as response:
+        if response.status_code == 304:
+            return FetchResult(path, False, 304)
+        response.raise_for_status()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # write to a temporary file so an interrupted download never
+        # replaces a good copy
+        with open(path + ".part", "wb") as file:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                file.write(chunk)
+        os.replace(path + ".part", path)
+        _save_validators(path, response.headers)
+        return FetchResult(path, True, response.status_code)
+
+
+def fetch_pkgbuild(package, directory):
+    """fetch the PKGBUILD of package to directory/package/PKGBUILD
+    returns a FetchResult
+    """
+    return fetch(pkgbuild_raw_url(package), os.path.join(directory, package, "PKGBUILD"))
+
+
+def fetch_pkg(package, directory):
+    """fetch the source package of package to directory/package.tar.gz
+    returns a FetchResult
+    """
+    return fetch(pkg_url(package), os.path.join(directory, package + ".tar.gz"))
+
+
+def fetch_many(packages, directory, fetcher=fetch_pkgbuild, workers=ccr.parallel.DEFAULT_WORKERS):
+    """run fetcher (fetch_pkgbuild or fetch_pkg) for every package concurrently
+    yields (package, FetchResult) pairs as they complete, with the error in
+    place of the FetchResult if a fetch failed
+    """
+    return ccr.parallel._run(lambda package: fetcher(package, directory), packages,
+                             workers, False, True)
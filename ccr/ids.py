@@ -0,0 +1,65 @@
+"""An index of the CCR IDs of packages
+
+the Session actions and url() need a package's ID, which only an info()
+query returns; with ccr.set_id_index(IdIndex()) every info, search,
+msearch and latest result feeds the index, and the IDs found there are
+used without asking the CCR again
+"""
+
+import sqlite3
+import threading
+
+__all__ = ["IdIndex"]
+
+
+class IdIndex(object):
+    """maps package names to CCR IDs, in memory
+    path keeps them in a sqlite database too, so they survive between
+    processes
+    """
+
+    def __init__(self, path=None):
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS ids (name TEXT PRIMARY KEY, id TEXT)")
+            self.conn.commit()
+            self._ids.update(self.conn.execute("SELECT name, id FROM ids"))
+
+    def get(self, name):
+        """returns the ID of package 'name', None if it isn't known"""
+        return self._ids.get(name)
+
+    def update(self, pairs):
+        """record (name, ID) pairs"""
+        with self._lock:
+            changed = [(name, ccrid) for name, ccrid in pairs if self._ids.get(name) != ccrid]
+            if not changed:
+                return
+            self._ids.update(changed)
+            if self.conn is not None:
+                self.conn.executemany("INSERT OR REPLACE INTO ids (name, id) VALUES (?,?)", changed)
+                self.conn.commit()
+
+    def forget(self, name):
+        """drop the ID of package 'name', once it was deleted or proved wrong"""
+        with self._lock:
+            if self._ids.pop(name, None) is not None and self.conn is not None:
+                self.conn.execute("DELETE FROM ids WHERE name=?", (name,))
+                self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM ids")
+                self.conn.commit()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
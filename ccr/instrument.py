@@ -0,0 +1,262 @@
+"""Instrumentation of the requests sent to the CCR
+
+hooks registered with add_hook get an Event before ("pre") and after
+("post") every RPC query of the static functions and every request of a
+Session; a Collector is a ready-made post hook keeping counters and
+histograms, exported as a dict or in the Prometheus text format
+"""
+
+import contextlib
+import logging
+import threading
+import time
+import urllib.parse
+
+__all__ = ["Event", "add_hook", "remove_hook", "Collector", "DEFAULT_BUCKETS"]
+
+# seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_logger = logging.getLogger(__name__)
+
+# (pre, post) pairs
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+class Event(object):
+    """a request to the CCR
+    kind: "rpc" for the queries of the static functions, "session" for the
+    requests of a Session
+    method: the RPC method ("info", "search"...) or the HTTP method
+    arg: the RPC argument, None for session requests
+    url, status (HTTP status code), bytes (size of the response body)
+    ttfb: seconds until the response headers were read
+    total: seconds spent in the whole call, parse included
+    parse: seconds spent decoding the JSON of an RPC query
+    dns, connect: always None, requests doesn't time them separately
+    error: the exception raised by the call, if any
+    the fields are None until they are known; pre hooks only see kind,
+    method, arg and url
+    """
+    __slots__ = ("kind", "method", "arg", "url", "status", "bytes", "dns", "connect",
+                 "ttfb", "total", "parse", "error")
+
+    def __init__(self, kind, method, arg, url):
+        self.kind = kind
+        self.method = method
+        self.arg = arg
+        self.url = url
+        self.status = self.bytes = self.dns = self.connect = None
+        self.ttfb = self.total = self.parse = self.error = None
+
+    @property
+    def endpoint(self):
+        """the page requested: "rpc.php", "packages.php"..."""
+        return urllib.parse.urlsplit(self.url).path.rsplit("/", 1)[-1]
+
+    def record(self, response, stream=False):
+        """fill status, bytes and ttfb from a requests response
+        the body of a streamed response isn't read, its size comes from the
+        Content-Length header
+        """
+        self.status = response.status_code
+        self.ttfb = response.elapsed.total_seconds()
+        if stream:
+            length = response.headers.get("Content-Length")
+            self.bytes = int(length) if length is not None else None
+        else:
+            self.bytes = len(response.content)
+
+    def __repr__(self):
+        return "<Event {} {} {} {}>".format(self.kind, self.method, self.url, self.status)
+
+
+def add_hook(pre=None, post=None):
+    """call pre(event) before and post(event) after every request
+    returns a handle for remove_hook
+    exceptions raised by the hooks are logged and ignored
+    """
+    handle = (pre, post)
+    with _hooks_lock:
+        _hooks.append(handle)
+    return handle
+
+
+def remove_hook(handle):
+    """unregister the hooks added by add_hook
+    raises a ValueError if they aren't registered
+    """
+    with _hooks_lock:
+        _hooks.remove(handle)
+
+
+def _call(hook, event):
+    """call a hook, logging its errors - for internal use only"""
+    try:
+        hook(event)
+    except Exception:
+        _logger.exception("instrumentation hook {!r} failed".format(hook))
+
+
+@contextlib.contextmanager
+def timed(kind, method, arg, url):
+    """time the requests made in the with block - for internal use only
+    yields the Event to fill, or None if no hook is registered
+    """
+    hooks = list(_hooks)
+    if not hooks:
+        yield None
+        return
+    event = Event(kind, method, arg, url)
+    for pre, _ in hooks:
+        if pre is not None:
+            _call(pre, event)
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as e:
+        event.error = e
+        raise
+    finally:
+        event.total = time.perf_counter() - start
+        for _, post in hooks:
+            if post is not None:
+                _call(post, event)
+
+
+class _Histogram(object):
+    """cumulative bucket counts, sum and count - for internal use only"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def as_dict(self):
+        buckets = {"{:g}".format(bound): count for bound, count in zip(self.buckets, self.counts)}
+        buckets["+Inf"] = self.count
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+def _labels(names, values):
+    """returns the Prometheus label string - for internal use only"""
+    return ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                    for name, value in zip(names, values))
+
+
+class Collector(object):
+    """post hook keeping, per kind, method and endpoint:
+    ccr_requests_total (also per status), ccr_errors_total,
+    ccr_response_bytes_total and the ccr_request_seconds, ccr_ttfb_seconds
+    and ccr_parse_seconds histograms
+    buckets are the histogram upper bounds in seconds
+    """
+    LABELS = ("kind", "method", "endpoint")
+    COUNTERS = {
+        "ccr_requests_total": "Requests sent to the CCR",
+        "ccr_errors_total": "Requests that raised an exception",
+        "ccr_response_bytes_total": "Bytes received from the CCR",
+    }
+    HISTOGRAMS = {
+        "ccr_request_seconds": "Duration of the calls, JSON decoding included",
+        "ccr_ttfb_seconds": "Time until the response headers were read",
+        "ccr_parse_seconds": "Time spent decoding RPC responses",
+    }
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._handle = None
+        self.reset()
+
+    def reset(self):
+        """forget everything collected so far"""
+        with self._lock:
+            self._counters = {name: {} for name in self.COUNTERS}
+            self._histograms = {name: {} for name in self.HISTOGRAMS}
+
+    def install(self):
+        """start collecting, returns the collector"""
+        if self._handle is None:
+            self._handle = add_hook(post=self)
+        return self
+
+    def uninstall(self):
+        """stop collecting"""
+        if self._handle is not None:
+            remove_hook(self._handle)
+            self._handle = None
+
+    def _count(self, name, labels, value=1):
+        counter = self._counters[name]
+        counter[labels] = counter.get(labels, 0) + value
+
+    def _observe(self, name, labels, value):
+        histograms = self._histograms[name]
+        if labels not in histograms:
+            histograms[labels] = _Histogram(self.buckets)
+        histograms[labels].observe(value)
+
+    def __call__(self, event):
+        labels = (event.kind, event.method, event.endpoint)
+        with self._lock:
+            status = "" if event.status is None else event.status
+            self._count("ccr_requests_total", labels + (status,))
+            if event.error is not None:
+                self._count("ccr_errors_total", labels)
+            if event.bytes is not None:
+                self._count("ccr_response_bytes_total", labels, event.bytes)
+            self._observe("ccr_request_seconds", labels, event.total)
+            if event.ttfb is not None:
+                self._observe("ccr_ttfb_seconds", labels, event.ttfb)
+            if event.parse is not None:
+                self._observe("ccr_parse_seconds", labels, event.parse)
+
+    def _label_names(self, name):
+        return self.LABELS + ("status",) if name == "ccr_requests_total" else self.LABELS
+
+    def as_dict(self):
+        """returns the metrics as {metric: [{"labels": {...}, ...}]}, with a
+        "value" for the counters and "buckets", "sum" and "count" for the
+        histograms
+        """
+        metrics = {}
+        with self._lock:
+            for name, counter in self._counters.items():
+                names = self._label_names(name)
+                metrics[name] = [{"labels": dict(zip(names, labels)), "value": value}
+                                 for labels, value in counter.items()]
+            for name, histograms in self._histograms.items():
+                metrics[name] = [dict(histogram.as_dict(), labels=dict(zip(self.LABELS, labels)))
+                                 for labels, histogram in histograms.items()]
+        return metrics
+
+    def prometheus(self):
+        """returns the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, counter in self._counters.items():
+                lines.append("# HELP {} {}".format(name, self.COUNTERS[name]))
+                lines.append("# TYPE {} counter".format(name))
+                names = self._label_names(name)
+                for labels, value in counter.items():
+                    lines.append("{}{{{}}} {}".format(name, _labels(names, labels), value))
+            for name, histograms in self._histograms.items():
+                lines.append("# HELP {} {}".format(name, self.HISTOGRAMS[name]))
+                lines.append("# TYPE {} histogram".format(name))
+                for labels, histogram in histograms.items():
+                    labels = _labels(self.LABELS, labels)
+                    for bound, count in histogram.as_dict()["buckets"].items():
+                        lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+                    lines.append("{}_sum{{{}}} {!r}".format(name, labels, histogram.sum))
+                    lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,161 @@
+"""A local mirror of the CCR package metadata
+
+packages pulled with latest(), search() and msearch() are stored in an
+indexed sqlite database; once filled, ccr.set_offline(mirror) makes info,
+search and msearch answer from it without touching the network
+"""
+
+import json
+import sqlite3
+import threading
+from ccr.ratelimit import background
+from ccr.ccr import search, msearch, latest, Struct, PackageNotFound, _json_default
+
+__all__ = ["Mirror"]
+
+CCR_MIRROR = "ccr-mirror.db"
+# number of packages asked from latest() by the first sync request
+SYNC_BATCH = 100
+SYNC_MAXIMUM = 10000
+
+
+def _int(value):
+    """convert a CCR numeric field, which may be missing or empty - for internal use only"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Mirror(object):
+    """CCR package metadata stored in the sqlite database 'path'"""
+
+    def __init__(self, path=CCR_MIRROR):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS packages (
+                ID TEXT PRIMARY KEY, Name TEXT UNIQUE, Maintainer TEXT, MaintainerUID TEXT,
+                CategoryID INTEGER, OutOfDate INTEGER, LastModified INTEGER,
+                Description TEXT, data TEXT);
+            CREATE INDEX IF NOT EXISTS packages_maintainer ON packages (Maintainer);
+            CREATE INDEX IF NOT EXISTS packages_category ON packages (CategoryID);
+            CREATE INDEX IF NOT EXISTS packages_outofdate ON packages (OutOfDate);
+            CREATE INDEX IF NOT EXISTS packages_lastmodified ON packages (LastModified);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    def close(self):
+        """close the database"""
+        self.conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM packages").fetchone()[0]
+
+    def store(self, packages):
+        """add or update packages, a list of CCR results"""
+        rows = [(package.ID, package.Name, package.get("Maintainer"), package.get("MaintainerUID"),
+                 _int(package.get("CategoryID")), _int(package.get("OutOfDate")),
+                 _int(package.get("LastModified")), package.get("Description"),
+                 json.dumps(package, default=_json_default))
+                for package in packages]
+        with self._lock:
+            # the same name may come back with a new ID after a delete/resubmit
+            self.conn.executemany("DELETE FROM packages WHERE Name=?", [(row[1],) for row in rows])
+            self.conn.executemany("INSERT OR REPLACE INTO packages VALUES (?,?,?,?,?,?,?,?,?)", rows)
+            self.conn.commit()
+
+    def remove(self, package):
+        """forget package"""
+        with self._lock:
+            self.conn.execute("DELETE FROM packages WHERE Name=?", (package,))
+            self.conn.commit()
+
+    @property
+    def high_water_mark(self):
+        """the newest LastModified seen by sync"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key='high_water_mark'").fetchone()
+        return row[0] if row else 0
+
+    def sync(self, batch=SYNC_BATCH, maximum=SYNC_MAXIMUM):
+        """fetch the packages modified since the last sync through latest()
+        asks for 'batch' packages and doubles that, up to 'maximum', until it
+        reaches packages that are already known
+        returns the number of packages stored
+        runs at background rate limiting priority
+        """
+        mark = self.high_water_mark
+        num = batch
+        while True:
+            with background():
+                packages = latest(num).results
+            newer = [package for package in packages if _int(package.get("LastModified")) > mark]
+            if len(newer) < len(packages) or len(packages) < num or num >= maximum:
+                break
+            num = min(2 * num, maximum)
+        self.store(newer)
+        if newer:
+            mark = max(mark, max(_int(package.get("LastModified")) for package in newer))
+            with self._lock:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('high_water_mark', ?)", (mark,))
+                self.conn.commit()
+        return len(newer)
+
+    def pull_search(self, keywords):
+        """store every package search(keywords) finds, returns their number"""
+        with background():
+            packages = search(keywords, offline=False)
+        self.store(packages)
+        return len(packages)
+
+    def pull_msearch(self, maintainer):
+        """store every package of maintainer, returns their number"""
+        with background():
+            packages = msearch(maintainer, offline=False)
+        self.store(packages)
+        return len(packages)
+
+    def _select(self, where, args):
+        """returns the packages matching the where clause - for internal use only"""
+        with self._lock:
+            rows = self.conn.execute("SELECT data FROM packages WHERE " + where + " ORDER BY Name",
+                                     args).fetchall()
+        return [json.loads(row[0], object_hook=Struct) for row in rows]
+
+    def info(self, package):
+        """get information for a specific package, see ccr.info
+        raises a PackageNotFound exception if the package isn't mirrored
+        """
+        results = self._select("Name=?", (package,))
+        if not results:
+            raise PackageNotFound("Package {} couldn't be found".format(package))
+        return results[0]
+
+    def search(self, keywords):
+        """search the names and descriptions for keywords, see ccr.search"""
+        pattern = "%" + keywords.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return self._select("Name LIKE ? ESCAPE '\\' OR Description LIKE ? ESCAPE '\\'",
+                            (pattern, pattern))
+
+    def msearch(self, maintainer):
+        """search for packages owned by 'maintainer', "0" for orphans, see ccr.msearch"""
+        if maintainer == "0":
+            return self._select("MaintainerUID='0' OR Maintainer IS NULL", ())
+        return self._select("Maintainer=?", (maintainer,))
+
+    def outdated(self):
+        """returns the packages flagged out of date"""
+        return self._select("OutOfDate=1", ())
+
+    def category(self, category_id):
+        """returns the packages in category_id"""
+        return self._select("CategoryID=?", (category_id,))
@@ -0,0 +1,85 @@
+"""Streaming multipart/form-data bodies
+
+requests builds multipart bodies in memory; a MultipartEncoder is passed
+as 'data' instead and yields the body piece by piece, reading the files
+in chunks, so uploads use constant memory whatever the file sizes
+"""
+
+import os
+import uuid
+
+__all__ = ["MultipartEncoder", "CHUNK_SIZE"]
+
+# bytes read from a file at once
+CHUNK_SIZE = 64 * 1024
+
+
+def _quote(value):
+    """escape a name or filename for a Content-Disposition header - for internal use only"""
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartEncoder(object):
+    """a multipart/form-data body
+    fields maps form field names to values, files maps field names to
+    (filename, file object) pairs; the files are read from their current
+    position when the body is sent, and every iteration starts over from
+    there, so the body can be sent again on a retry
+    use content_type as the Content-Type header of the request
+    """
+
+    def __init__(self, fields, files, boundary=None, chunk_size=CHUNK_SIZE):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.fields = [(name, str(value)) for name, value in fields.items()]
+        self.files = [(name, filename, fileobj) for name, (filename, fileobj) in files.items()]
+        self._starts = None
+        self._length = None
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary=" + self.boundary
+
+    def _field_header(self, name):
+        return ("--{}\r\nContent-Disposition: form-data; name=\"{}\"\r\n\r\n".format(
+            self.boundary, _quote(name))).encode("utf-8")
+
+    def _file_header(self, name, filename):
+        return ("--{}\r\nContent-Disposition: form-data; name=\"{}\"; filename=\"{}\"\r\n"
+                "Content-Type: application/octet-stream\r\n\r\n").format(
+                    self.boundary, _quote(name), _quote(os.path.basename(filename))).encode("utf-8")
+
+    def _end(self):
+        return "--{}--\r\n".format(self.boundary).encode("utf-8")
+
+    def _positions(self):
+        """returns the offsets the files are read from, taken once - for internal use only"""
+        if self._starts is None:
+            self._starts = [fileobj.tell() for _, _, fileobj in self.files]
+        return self._starts
+
+    def __len__(self):
+        # computed when requests asks for the Content-Length, not before
+        if self._length is None:
+            length = len(self._end())
+            for name, value in self.fields:
+                length += len(self._field_header(name)) + len(value.encode("utf-8")) + 2
+            for (name, filename, fileobj), start in zip(self.files, self._positions()):
+                size = os.fstat(fileobj.fileno()).st_size - start
+                length += len(self._file_header(name, filename)) + size + 2
+            self._length = length
+        return self._length
+
+    def __iter__(self):
+        for name, value in self.fields:
+            yield self._field_header(name) + value.encode("utf-8") + b"\r\n"
+        for (name, filename, fileobj), start in zip(self.files, self._positions()):
+            yield self._file_header(name, filename)
+            fileobj.seek(start)
+            while True:
+                chunk = fileobj.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            yield b"\r\n"
+        yield self._end()
@@ -0,0 +1,93 @@
+"""Run the static CCR queries concurrently on a bounded thread pool"""
+
+import collections
+import concurrent.futures
+import itertools
+import ccr.ccr
+import ccr.ratelimit
+from ccr.ccr import search, info, msearch, latest
+
+__all__ = ["configure_pool", "map_search", "map_info", "map_msearch", "map_latest"]
+
+DEFAULT_WORKERS = 8
+
+
+def configure_pool(pool_connections=None, pool_maxsize=DEFAULT_WORKERS):
+    """set the connection limits of the current transport, shared by the
+    static functions and the Sessions using it
+    pool_connections is the number of hosts to keep pools for, unchanged if
+    None, pool_maxsize the number of connections kept per host
+    """
+    ccr.ccr.get_transport().resize(pool_connections, pool_maxsize)
+
+
+def _outcome(future, return_exceptions):
+    """returns the result of a finished future - for internal use only"""
+    if return_exceptions and future.exception() is not None:
+        return future.exception()
+    return future.result()
+
+
+def _run(func, args, workers, ordered, return_exceptions):
+    """call func on every arg using 'workers' threads and yield (arg, result)
+    pairs - for internal use only
+    at most two calls per worker are queued at any time, so 'args' may be a
+    long (or lazy) iterable
+    the calls keep the rate limiting priority of the calling thread
+    """
+    # grow the pool of the current transport so that no worker waits for a
+    # connection, never shrink it
+    ccr.ccr.get_transport().grow(workers)
+    level = ccr.ratelimit.current_priority()
+
+    def call(arg):
+        with ccr.ratelimit.priority(level):
+            return func(arg)
+    args = iter(args)
+    pending = collections.OrderedDict()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def fill():
+            for arg in itertools.islice(args, 2 * workers - len(pending)):
+                pending[executor.submit(call, arg)] = arg
+
+        fill()
+        while pending:
+            if ordered:
+                done = [next(iter(pending))]
+            else:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                arg = pending.pop(future)
+                yield arg, _outcome(future, return_exceptions)
+            fill()
+
+
+def map_search(keywords, workers=DEFAULT_WORKERS, ordered=True, return_exceptions=False):
+    """run search for every keyword concurrently
+    yields (keyword, results) pairs, in input order if 'ordered' is True or
+    as soon as they complete otherwise
+    with 'return_exceptions', errors are yielded in place of the results
+    instead of being raised
+    """
+    return _run(search, keywords, workers, ordered, return_exceptions)
+
+
+def map_info(packages, workers=DEFAULT_WORKERS, ordered=True, return_exceptions=False):
+    """run info for every package concurrently
+    yields (package, results) pairs, see map_search
+    """
+    return _run(info, packages, workers, ordered, return_exceptions)
+
+
+def map_msearch(maintainers, workers=DEFAULT_WORKERS, ordered=True, return_exceptions=False):
+    """run msearch for every maintainer concurrently
+    yields (maintainer, results) pairs, see map_search
+    """
+    return _run(msearch, maintainers, workers, ordered, return_exceptions)
+
+
+def map_latest(nums, workers=DEFAULT_WORKERS, ordered=True, return_exceptions=False):
+    """run latest for every num concurrently
+    yields (num, results) pairs, see map_search
+    """
+    return _run(latest, nums, workers, ordered, return_exceptions)
@@ -0,0 +1,268 @@
+"""A pool of authenticated Sessions shared by worker threads
+
+a Session holds one login and must not be used by two threads at once;
+a SessionPool keeps several Sessions for one or many accounts, logs them in
+on first use and hands each of them to one thread at a time:
+
+    pool = SessionPool([AuthDB(), ("bot", "secret")], size=4)
+    with pool.session("bot") as session:
+        session.flag("foo")
+"""
+
+import contextlib
+import threading
+import time
+from ccr.cookies import SESSION_TIMEOUT, EXPIRY_MARGIN
+from ccr.session import Session, VERIFY_STRICT
+
+__all__ = ["SessionPool", "PoolTimeout", "POOL_SIZE", "MAX_IDLE"]
+
+# sessions kept per account
+POOL_SIZE = 4
+# seconds a session may stay unused before it is closed
+MAX_IDLE = 5 * 60
+
+
+class PoolTimeout(TimeoutError):
+    """No session became free in time"""
+
+
+class _Pooled(object):
+    """a session of the pool and what is known of its login - for internal use only"""
+
+    def __init__(self, session, username, login):
+        self.session = session
+        self.username = username
+        self.login = login
+        self.idle_since = None
+
+
+def _login_cookie(session):
+    """returns the AURSID cookie of a session, None if it has none - for internal use only"""
+    for cookie in session._session.cookies:
+        if cookie.name == "AURSID":
+            return cookie
+    return None
+
+
+def _login_time(session, store):
+    """returns when the login of a new session was made; a login reused from
+    the cookie store dates from when it was saved - for internal use only
+    """
+    cookie = _login_cookie(session)
+    record = store.load_cookies() if store is not None else None
+    if cookie is not None and record:
+        for saved in record.get("cookies", ()):
+            if saved["name"] == "AURSID" and saved["value"] == cookie.value:
+                return record["saved"]
+    return time.time()
+
+
+class SessionPool(object):
+    """keeps up to 'size' authenticated Sessions for each account
+    credentials are ccrauth backends (AuthFile, AuthDB, AuthKWallet), which
+    also keep the login cookies so that the sessions of an account log in
+    once, or (username, password) pairs
+    sessions are created on checkout when no idle one is left, checked for
+    a live AURSID cookie before being handed out again and closed once
+    unused for max_idle seconds (None keeps them)
+    timeout is the default number of seconds checkout waits for a session,
+    None waits forever
+    rememberme, verification and transport are passed to every Session;
+    they share the transport's connection pool, whose pool_maxsize should
+    cover the sessions used at once
+    """
+
+    def __init__(self, credentials, size=POOL_SIZE, max_idle=MAX_IDLE, timeout=None,
+                 rememberme=False, verification=VERIFY_STRICT, transport=None):
+        if size < 1:
+            raise ValueError(size)
+        self.size = size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.rememberme = rememberme
+        self.verification = verification
+        self.transport = transport
+        # username -> (password, cookie store)
+        self._accounts = {}
+        for credential in credentials:
+            if isinstance(credential, tuple):
+                username, password = credential
+                store = None
+            else:
+                username, password, store = credential.username, credential.password, credential
+            if not username:
+                raise ValueError(credential)
+            self._accounts[username] = (password, store)
+        if not self._accounts:
+            raise ValueError(credentials)
+        self._idle = {username: [] for username in self._accounts}
+        self._live = dict.fromkeys(self._accounts, 0)
+        self._busy = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    @property
+    def usernames(self):
+        return list(self._accounts)
+
+    def _expired(self):
+        """take the sessions idle for more than max_idle out of the pool,
+        the lock being held - for internal use only
+        """
+        if self.max_idle is None:
+            return []
+        limit = time.monotonic() - self.max_idle
+        expired = []
+        for username, idle in self._idle.items():
+            # the least recently used sessions come first
+            while idle and idle[0].idle_since < limit:
+                expired.append(idle.pop(0))
+                self._live[username] -= 1
+        return expired
+
+    def _reserve(self, username):
+        """returns (username, idle session) or (username, None) when a new
+        session may be created, None if the accounts are all busy; the lock
+        being held - for internal use only
+        """
+        candidates = [username] if username is not None else list(self._accounts)
+        for candidate in candidates:
+            if self._idle[candidate]:
+                return candidate, self._idle[candidate].pop()
+        free = [candidate for candidate in candidates if self._live[candidate] < self.size]
+        if not free:
+            return None
+        candidate = min(free, key=self._live.get)
+        self._live[candidate] += 1
+        return candidate, None
+
+    def _healthy(self, entry):
+        """tell whether a session still holds a login the CCR accepts,
+        without asking it - for internal use only
+        """
+        cookie = _login_cookie(entry.session)
+        if cookie is None:
+            return False
+        expires = cookie.expires if cookie.expires is not None else entry.login + SESSION_TIMEOUT
+        return expires > time.time() + EXPIRY_MARGIN
+
+    def _discard(self, entry, healthy=True):
+        """close a session taken out of the pool - for internal use only"""
+        if not healthy:
+            # don't let close() save the dead login over a newer one
+            entry.session._session.cookies.clear()
+        entry.session.close()
+
+    def _create(self, username):
+        """log a new session in, its slot being reserved - for internal use only"""
+        password, store = self._accounts[username]
+        try:
+            session = Session(username, password, self.rememberme, self.verification,
+                              self.transport, cookies=store)
+        except BaseException:
+            with self._condition:
+                self._live[username] -= 1
+                self._condition.notify()
+            raise
+        return _Pooled(session, username, _login_time(session, store))
+
+    def checkout(self, username=None, timeout=None):
+        """returns a Session of 'username', of any account if None, to be
+        given back with checkin
+        waits up to timeout seconds (the pool's timeout by default) while
+        all the sessions are in use
+        raises a KeyError if username isn't an account of the pool
+        raises a PoolTimeout if no session became free in time
+        raises a ValueError if login fails
+        raises a ConnectionError if a network error occur
+        """
+        if username is not None and username not in self._accounts:
+            raise KeyError(username)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        expired = []
+        try:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise ValueError("the pool is closed")
+                    expired.extend(self._expired())
+                    found = self._reserve(username)
+                    if found is not None:
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise PoolTimeout(username)
+                    self._condition.wait(remaining)
+        finally:
+            for entry in expired:
+                self._discard(entry)
+        account, entry = found
+        if entry is None:
+            entry = self._create(account)
+        elif not self._healthy(entry):
+            self._discard(entry, healthy=False)
+            entry = self._create(account)
+        with self._condition:
+            self._busy[entry.session] = entry
+        return entry.session
+
+    def checkin(self, session):
+        """give back a Session returned by checkout
+        raises a KeyError if it doesn't come from this pool or was already
+        given back
+        """
+        with self._condition:
+            entry = self._busy.pop(session)
+            if not self._closed:
+                entry.idle_since = time.monotonic()
+                self._idle[entry.username].append(entry)
+                self._condition.notify()
+                return
+            self._live[entry.username] -= 1
+        self._discard(entry)
+
+    @contextlib.contextmanager
+    def session(self, username=None, timeout=None):
+        """checkout a Session for the duration of a with block"""
+        session = self.checkout(username, timeout)
+        try:
+            yield session
+        finally:
+            self.checkin(session)
+
+    def evict(self):
+        """close the sessions idle for more than max_idle
+        returns the number of sessions closed
+        """
+        with self._condition:
+            expired = self._expired()
+            self._condition.notify_all()
+        for entry in expired:
+            self._discard(entry)
+        return len(expired)
+
+    def stats(self):
+        """returns username -> (sessions in use, idle sessions)"""
+        with self._condition:
+            return {username: (self._live[username] - len(idle), len(idle))
+                    for username, idle in self._idle.items()}
+
+    def close(self):
+        """close the idle sessions now and the others as they are given back"""
+        with self._condition:
+            self._closed = True
+            idle = [entry for entries in self._idle.values() for entry in entries]
+            for username, entries in self._idle.items():
+                self._live[username] -= len(entries)
+                entries.clear()
+            self._condition.notify_all()
+        for entry in idle:
+            self._discard(entry)
@@ -0,0 +1,140 @@
+"""Client-side rate limiting of the requests sent to the CCR
+
+a Limiter holds one token bucket for RPC reads and one for packages.php and
+pkgsubmit.php writes; install it with ccr.set_transport(Transport(limiter=...))
+requests made inside 'with background():' wait behind interactive ones
+"""
+
+import contextlib
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+
+__all__ = ["INTERACTIVE", "BACKGROUND", "priority", "background", "current_priority",
+           "TokenBucket", "SQLiteBucket", "Limiter"]
+
+# lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_local = threading.local()
+
+
+def current_priority():
+    """returns the priority of the requests made by this thread"""
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level):
+    """make the requests of this thread use priority 'level'"""
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def background():
+    """make the requests of this thread wait behind interactive ones"""
+    return priority(BACKGROUND)
+
+
+class TokenBucket(object):
+    """allows 'rate' requests per second on average, with bursts of up to
+    'capacity' requests; waiting threads are served by priority, then in
+    arrival order
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._counter = itertools.count()
+
+    def _take(self, tokens):
+        """take tokens if there are enough, returns 0 on success or the
+        seconds to wait for them - for internal use only
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0
+        return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, level=None):
+        """wait until tokens are available and take them
+        level defaults to the priority of the calling thread
+        """
+        ticket = (current_priority() if level is None else level, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                if self._waiters[0] is ticket:
+                    wait = self._take(tokens)
+                    if not wait:
+                        heapq.heappop(self._waiters)
+                        self._condition.notify_all()
+                        return
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+
+
+class SQLiteBucket(TokenBucket):
+    """a TokenBucket kept in the sqlite database 'path', so every process
+    using the same path and name shares one budget
+    """
+
+    def __init__(self, path, rate, capacity=None, name="default"):
+        super().__init__(rate, capacity)
+        self.name = name
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, last REAL)")
+
+    def _take(self, tokens):
+        # BEGIN IMMEDIATE locks the database against the other processes
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = self.conn.execute("SELECT tokens, last FROM buckets WHERE name=?", (self.name,)).fetchone()
+            available = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+            wait = 0 if available >= tokens else (tokens - available) / self.rate
+            if not wait:
+                available -= tokens
+            self.conn.execute("INSERT OR REPLACE INTO buckets VALUES (?,?,?)", (self.name, available, now))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def close(self):
+        self.conn.close()
+
+
+class Limiter(object):
+    """separate budgets for RPC reads and packages.php/pkgsubmit.php writes,
+    in requests per second
+    path shares the budgets with the other processes using the same sqlite file
+    """
+
+    def __init__(self, read_rate=5, write_rate=1, read_burst=None, write_burst=None, path=None):
+        if path is None:
+            self.reads = TokenBucket(read_rate, read_burst)
+            self.writes = TokenBucket(write_rate, write_burst)
+        else:
+            self.reads = SQLiteBucket(path, read_rate, read_burst, "reads")
+            self.writes = SQLiteBucket(path, write_rate, write_burst, "writes")
+
+    def acquire(self, method):
+        """wait for the budget of a request with the HTTP 'method'"""
+        (self.writes if method == "POST" else self.reads).acquire()
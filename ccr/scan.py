@@ -0,0 +1,60 @@
+"""Look for markers in a streamed response without reading all of it
+
+the Session checks only need to know which of a few strings a page
+contains; a Scanner reads the raw body chunk by chunk and stops at the
+first marker found, all markers being searched in a single pass
+"""
+
+import re
+
+__all__ = ["Scanner", "release", "CHUNK_SIZE", "DRAIN_LIMIT"]
+
+# bytes read at once
+CHUNK_SIZE = 8 * 1024
+# unread bytes drained from a response to keep its connection, beyond
+# that the connection is closed; a packages.php page is larger than this
+DRAIN_LIMIT = 4 * 1024
+
+
+class Scanner(object):
+    """finds the first of several markers (str or bytes) in a stream of bytes
+    the markers are compiled into one regular expression, so each chunk is
+    searched once whatever the number of markers; matches spanning two
+    chunks are found too
+    """
+
+    def __init__(self, markers):
+        self.markers = list(markers)
+        encoded = [m.encode("utf-8") if isinstance(m, str) else bytes(m) for m in self.markers]
+        self._markers = dict(zip(encoded, self.markers))
+        self._regex = re.compile(b"|".join(re.escape(m) for m in encoded))
+        self._overlap = max(len(m) for m in encoded) - 1
+
+    def search(self, chunks, data):
+        """read 'chunks' into the bytearray 'data' until a marker appears
+        returns the marker, or None once the chunks are exhausted
+        """
+        for chunk in chunks:
+            # a marker may start in the previous chunk
+            start = max(0, len(data) - self._overlap)
+            data += chunk
+            match = self._regex.search(data, start)
+            if match is not None:
+                return self._markers[match.group()]
+        return None
+
+
+def release(response, chunks, limit=DRAIN_LIMIT):
+    """be done with a streamed response whose 'chunks' were partly read
+    the rest of a small body is read so that the connection can be reused,
+    the connection of a large one is closed, at once when the length of
+    the body is known
+    """
+    remaining = getattr(response.raw, "length_remaining", None)
+    if not isinstance(remaining, int) or remaining <= limit:
+        drained = 0
+        for chunk in chunks:
+            drained += len(chunk)
+            if drained > limit:
+                break
+    response.close()
@@ -1,11 +1,19 @@
+import concurrent.futures
+import functools
 import re
 import logging
-import requests
+import threading
+import time
 from ccr.ccr import *
+from ccr.ccr import _invalidate_cache, _invalidate_missing, _indexed_id, _forget_id
+from ccr.cookies import _record, _restore
+from ccr.multipart import MultipartEncoder
+from ccr.scan import Scanner, release, CHUNK_SIZE as SCAN_CHUNK
 
-__all__ = ["Session", "PackageNotFound", "InvalidPackage", "CCRWarning"]
+__all__ = ["Session", "PackageNotFound", "InvalidPackage", "CCRWarning",
+           "VERIFY_STRICT", "VERIFY_DEFERRED", "VERIFY_NONE"]
 
-logging.basicConfig(level=logging.ERROR, format='>> %(levelname)s - %(message)s')
+_logger = logging.getLogger(__name__)
 
 
 class InvalidPackage(TypeError):
@@ -44,34 +52,113 @@ class _CategoryWarning(CCRWarning):
     """Setting the category failed"""
 
 
+def _forgets_stale_id(action):
+    """make an action finding its package gone drop the indexed ID of the
+    package - for internal use only
+    """
+    @functools.wraps(action)
+    def wrapper(self, package, *args, **kwargs):
+        try:
+            return action(self, package, *args, **kwargs)
+        except PackageNotFound:
+            _forget_id(package)
+            raise
+    return wrapper
+
+
+CATEGORIES = {
+    "none": 1,
+    "daemons": 2,
+    "devel": 3,
+    "editors": 4,
+    "emulators": 5,
+    "games": 6,
+    "gnome": 7,
+    "i18n": 8,
+    "kde": 9,
+    "lib": 10,
+    "modules": 11,
+    "multimedia": 12,
+    "network": 13,
+    "office": 14,
+    "educational": 15,
+    "system": 16,
+    "x11": 17,
+    "utils": 18,
+    "lib32": 19,
+}
+
+# bulk actions -> (packages.php form field, warning reported on failure)
+BULK_ACTIONS = {
+    "vote": ("do_Vote", _VoteWarning),
+    "unvote": ("do_UnVote", _VoteWarning),
+    "flag": ("do_Flag", _FlagWarning),
+    "unflag": ("do_UnFlag", _FlagWarning),
+    "notify": ("do_Notify", _NotifyWarning),
+    "unnotify": ("do_UnNotify", _NotifyWarning),
+    "adopt": ("do_Adopt", _OwnershipWarning),
+    "disown": ("do_Disown", _OwnershipWarning),
+    "delete": ("do_Delete", _DeleteWarning),
+}
+# the part of a package's state each verified action sets; a later action
+# on the same part overrides the earlier one, a delete overrides them all
+_ACTION_STATE = {
+    "vote": "vote",
+    "unvote": "vote",
+    "flag": "flag",
+    "unflag": "flag",
+    "adopt": "maintainer",
+    "disown": "maintainer",
+    "delete": "delete",
+}
+# number of packages sent in a single bulk POST
+BULK_CHUNK = 50
+# uploads running at once in submit_many
+SUBMIT_WORKERS = 4
+# markers looked for in the pages answering the actions; the pages are
+# only read until one of them shows up
+_UNVOTE_BUTTON = "class='button' name='do_UnVote'"
+_VOTE_SCANNER = Scanner([_UNVOTE_BUTTON, "class='button' name='do_Vote'"])
+_UNNOTIFY_SCANNER = Scanner(["<option value='do_UnNotify'"])
+_NOTIFY_SCANNER = Scanner(["<option value='do_Notify'"])
+_SUBMIT_ERROR = "<span class='error'>"
+_SUBMIT_SCANNER = Scanner([_SUBMIT_ERROR, "pkgbuild_view.php?p="])
+# only shown to logged in users
+_LOGGED_IN_SCANNER = Scanner(["logout.php"])
+# verification policies: re-query the CCR after every action, collect the
+# checks for verify_pending, or trust the server
+VERIFY_STRICT = "strict"
+VERIFY_DEFERRED = "deferred"
+VERIFY_NONE = "none"
+
+
 class Session(object):
-    """class for all CCR actions """
-
-    def __init__(self, username=None, password=None, rememberme=False):
-        self._cat2number = {
-            "none": 1,
-            "daemons": 2,
-            "devel": 3,
-            "editors": 4,
-            "emulators": 5,
-            "games": 6,
-            "gnome": 7,
-            "i18n": 8,
-            "kde": 9,
-            "lib": 10,
-            "modules": 11,
-            "multimedia": 12,
-            "network": 13,
-            "office": 14,
-            "educational": 15,
-            "system": 16,
-            "x11": 17,
-            "utils": 18,
-            "lib32": 19,
-        }
-        self._session = requests.session()
-        if username and password is not None:
-            self._username = username
+    """class for all CCR actions
+    verification sets how vote, unvote, flag, unflag, adopt, disown and
+    delete check that they worked: VERIFY_STRICT re-queries the CCR after
+    each of them, VERIFY_DEFERRED keeps the checks for verify_pending and
+    VERIFY_NONE skips them
+    transport is a ccr.transport.Transport, ccr.get_transport() by default;
+    sessions sharing a transport share its connection pool
+    cookies keeps the login between processes: a ccr.cookies.CookieFile or a
+    ccrauth backend (AuthFile, AuthDB); authenticate then reuses the saved
+    login while the CCR accepts it, password may be None while it is valid
+    """
+
+    def __init__(self, username=None, password=None, rememberme=False, verification=VERIFY_STRICT,
+                 transport=None, cookies=None):
+        if verification not in (VERIFY_STRICT, VERIFY_DEFERRED, VERIFY_NONE):
+            raise ValueError(verification)
+        self.verification = verification
+        self._pending = []
+        self._cat2number = CATEGORIES
+        self._transport = transport or get_transport()
+        self._session = self._transport.session(instrumented=True)
+        self._username = username
+        self._cookies = cookies
+        # when the login in use was made
+        self._logged_in_since = None
+        if username and (password is not None or cookies is not None):
             self.authenticate(username, password, rememberme)
 
     def __enter__(self):
@@ -81,14 +168,29 @@ class Session(object):
         self.close()
 
     def close(self):
-        """end the session"""
+        """end the session, saving the login cookies if they are kept"""
+        if self._cookies is not None and "AURSID" in self._session.cookies:
+            self._cookies.store_cookies(_record(self._session.cookies, self._username, self._logged_in_since))
         self._session.close()
 
     def authenticate(self, username, password, rememberme=False):
         """authenticate on CCR
+        with a cookie store, a saved login of username that hasn't expired
+        is reused once a single request showed that the CCR still accepts
+        it, otherwise it logs in again with password
         raises a ConnectionError if a network error occur
         raises a ValueError if login fails
         """
+        record = self._cookies.load_cookies() if self._cookies is not None else None
+        if record is not None and _restore(self._session.cookies, record, username):
+            if self._logged_in():
+                self._username = username
+                self._logged_in_since = record["saved"]
+                return
+            _logger.debug("The saved login of %s expired, logging in again", username)
+            self._session.cookies.clear()
+        if password is None:
+            raise ValueError(username, password)
         remember_me = "on" if rememberme else "off"
         data = {
             'user': username,
@@ -99,27 +201,119 @@ class Session(object):
         self._session.post(CCR_BASE, data)
 
         if not "AURSID" in self._session.cookies:
-            logging.debug("There was an error logging in. "
+            _logger.debug("There was an error logging in. "
                           "Please check if username and password are correct")
             raise ValueError(username, password)
+        self._username = username
+        self._logged_in_since = time.time()
+        if self._cookies is not None:
+            self._cookies.store_cookies(_record(self._session.cookies, username, self._logged_in_since))
+
+    def _logged_in(self):
+        """tell whether the CCR accepts the login cookie, reading its home
+        page only up to the logout link - for internal use only
+        """
+        response = self._session.get(CCR_BASE, stream=True)
+        return self._find(response, _LOGGED_IN_SCANNER)[0] is not None
+
+    def _verify(self, package, action, before, check, warning):
+        """verify an action according to the verification policy
+        check() tells whether the action worked, before is the package info
+        prior to it - for internal use only
+        """
+        if self.verification == VERIFY_DEFERRED:
+            self._pending.append((package, action, before))
+        elif self.verification == VERIFY_STRICT and not check():
+            raise warning
+
+    def verify_pending(self):
+        """check the actions deferred by VERIFY_DEFERRED in one batched pass
+        only the final state of each package is checked
+        returns a dict mapping every package to None if its actions worked,
+        or to the CCRWarning they would have raised, or to PackageNotFound
+        when a voted package no longer exists
+        raises a ConnectionError if a network error occur, the checks then
+        stay queued
+        """
+        queued = list(self._pending)
+        last = {}
+        for package, action, before in queued:
+            if action == "delete":
+                last = {key: value for key, value in last.items() if key[0] != package}
+            last[package, _ACTION_STATE[action]] = (package, action, before)
+        pending = list(last.values())
+        batched = [package for package, action, _ in pending if action not in ("vote", "unvote")]
+        after = info_many(batched)[0] if batched else {}
+        report = {}
+        for package, action, before in pending:
+            if action in ("vote", "unvote"):
+                try:
+                    succeeded = self.check_vote(package) == (action == "vote")
+                except PackageNotFound as e:
+                    report[package] = e
+                    continue
+            else:
+                succeeded = self._succeeded(action, before, after.get(package))
+            if succeeded is False:
+                report[package] = BULK_ACTIONS[action][1]("Couldn't {} {}".format(action, package))
+            else:
+                report.setdefault(package, None)
+        # the checks stay queued when the pass fails, actions queued meanwhile too
+        del self._pending[:len(queued)]
+        return report
+
+    def _package_info(self, package):
+        """info() raising PackageNotFound only, always online: the actions
+        must see the CCR as it is, not the mirror - for internal use only
+        """
+        try:
+            return info(package, offline=False)
+        except (ValueError, KeyError):
+            raise PackageNotFound(package)
+
+    def _package_id(self, package):
+        """returns the CCR ID of package, from the ID index when possible - for internal use only"""
+        return _indexed_id(package) or self._package_info(package).ID
+
+    def _exists(self, package):
+        """tell whether package is on the CCR - for internal use only"""
+        try:
+            info(package, offline=False)
+        except PackageNotFound:
+            return False
+        return True
+
+    def _find(self, response, scanner, complete=None):
+        """read a streamed response until one of the markers of 'scanner' and
+        release it - for internal use only
+        returns the marker found, or None after reading the whole body, and
+        the text read; the body is read in full after the marker 'complete'
+        """
+        chunks, data = iter(response.iter_content(SCAN_CHUNK)), bytearray()
+        try:
+            marker = scanner.search(chunks, data)
+            if marker is not None and marker == complete:
+                for chunk in chunks:
+                    data += chunk
+        finally:
+            release(response, chunks)
+        return marker, data.decode("utf-8", "replace")
 
     def check_vote(self, package, return_id=False):
         """check to see if you have already voted for a package
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         """
-        try:
-            ccrid = info(package).ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
-        response = self._session.get(CCR_PKG + "?ID=" + ccrid).text
+        response = self._session.get(CCR_PKG + "?ID=" + ccrid, stream=True)
 
-        if "class='button' name='do_UnVote'" in response:
+        if self._find(response, _VOTE_SCANNER)[0] == _UNVOTE_BUTTON:
             return (True, ccrid) if return_id else True
         else:
             return (False, ccrid) if return_id else False
 
+    @_forgets_stale_id
     def vote(self, package):
         """vote for a package on CCR
         raises a PackageNotFound if the package doesn't exist
@@ -137,11 +331,13 @@ class Session(object):
             "do_Vote": 1,
         }
         self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(package)
 
         # check if the package is voted now
-        if not self.check_vote(package):
-            raise _VoteWarning("Couldn't vote for {}".format(package))
+        self._verify(package, "vote", None, lambda: self.check_vote(package),
+                     _VoteWarning("Couldn't vote for {}".format(package)))
 
+    @_forgets_stale_id
     def unvote(self, package):
         """unvote a package on CCR
         raises a PackageNotFound exception if the package doesn't exist
@@ -159,21 +355,20 @@ class Session(object):
             "do_UnVote": 1,
         }
         self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(package)
 
         # check if the package is unvoted now
-        if self.check_vote(package):
-            raise _VoteWarning("Couldn't unvote {}".format(package))
+        self._verify(package, "unvote", None, lambda: not self.check_vote(package),
+                     _VoteWarning("Couldn't unvote {}".format(package)))
 
+    @_forgets_stale_id
     def flag(self, package):
         """flag a CCR package as out of date
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         raises a _FlagWarning on failure
         """
-        try:
-            ccrid = info(package).ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         data = {
             "IDs[%s]" % ccrid: 1,
@@ -181,20 +376,19 @@ class Session(object):
             "do_Flag": 1,
         }
         self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(package)
 
-        if info(package).OutOfDate == "0":
-            raise _FlagWarning("Couldn't flag {} as out of date".format(package))
+        self._verify(package, "flag", None, lambda: self._package_info(package).OutOfDate != "0",
+                     _FlagWarning("Couldn't flag {} as out of date".format(package)))
 
+    @_forgets_stale_id
     def unflag(self, package):
         """unflag a CCR package as out of date
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         raises a _FlagWarning on failure
         """
-        try:
-            ccrid = info(package).ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         data = {
             "IDs[%s]" % ccrid: 1,
@@ -202,67 +396,65 @@ class Session(object):
             "do_UnFlag": 1,
         }
         self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(package)
 
-        if info(package).OutOfDate == "1":
-            raise _FlagWarning("Couldn't remove flag".format(package))
+        self._verify(package, "unflag", None, lambda: self._package_info(package).OutOfDate != "1",
+                     _FlagWarning("Couldn't remove flag for {}".format(package)))
 
+    @_forgets_stale_id
     def notify(self, package):
         """set the notify flag on a package
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         raises a _NotifyWarning on failure
         """
-        try:
-            ccrid = info(package).ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         data = {
             "IDs[%s]" % ccrid: 1,
             "ID": ccrid,
             "do_Notify": 1,
         }
-        response = self._session.post(CCR_PKG, data=data).text
+        response = self._session.post(CCR_PKG, data=data, stream=True)
 
         # FIXME use a more stable check
-        if "<option value='do_UnNotify'" not in response:
-            raise _NotifyWarning(response)
+        marker, text = self._find(response, _UNNOTIFY_SCANNER)
+        if marker is None:
+            raise _NotifyWarning(text)
 
+    @_forgets_stale_id
     def unnotify(self, package):
         """unset the notify flag on a package
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         raises a _NotifyWarning on failure
         """
-        try:
-            ccrid = info(package).ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         data = {
             "IDs[%s]" % ccrid: 1,
             "ID": ccrid,
             "do_UnNotify": 1,
         }
-        response = self._session.post(CCR_PKG, data=data)
+        response = self._session.post(CCR_PKG, data=data, stream=True)
 
-        if "<option value='do_Notify'" not in response.text:
-            raise _NotifyWarning(response)
+        marker, text = self._find(response, _NOTIFY_SCANNER)
+        if marker is None:
+            raise _NotifyWarning(text)
 
+    @_forgets_stale_id
     def adopt(self, package):
         """adopt an orphaned CCR package
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         raises a _OwnershipWarning if the package is already maintained or if it fails
         """
-        try:
-            pkginfo = info(package)
-            ccrid = pkginfo.ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        # the maintainer must be checked, so the ID index doesn't help here
+        pkginfo = self._package_info(package)
+        ccrid = pkginfo.ID
 
         if pkginfo.MaintainerUID != "0":
-            logging.warning("Warning: Adopting maintained package!")
+            _logger.warning("Warning: Adopting maintained package!")
             raise _OwnershipWarning("Couldn't adopt {} : already maintained.".format(package))
 
         data = {
@@ -271,25 +463,18 @@ class Session(object):
             "do_Adopt": 1,
         }
         self._session.post(CCR_PKG, data=data)
-        try:
-            pkginfo = info(package)
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
-
-        if pkginfo.Maintainer != self._username:
-            raise _OwnershipWarning("Couldn't adopt {}".format(package))
+        _invalidate_cache(package)
+        self._verify(package, "adopt", pkginfo, lambda: self._package_info(package).Maintainer == self._username,
+                     _OwnershipWarning("Couldn't adopt {}".format(package)))
 
+    @_forgets_stale_id
     def disown(self, package):
         """disown a CCR package
         raises a PackageNotFound exception if the package doesn't exist
         raises a ConnectionError if a network error occur
         raises a _OwnershipWarning on failure
         """
-        try:
-            pkginfo = info(package)
-            ccrid = pkginfo.ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         data = {
             "IDs[%s]" % ccrid: 1,
@@ -297,9 +482,10 @@ class Session(object):
             "do_Disown": 1,
         }
         self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(package)
 
-        if info(package).MaintainerUID != "0":
-            raise _OwnershipWarning("Couldn't disown {}".format(package))
+        self._verify(package, "disown", None, lambda: self._package_info(package).MaintainerUID == "0",
+                     _OwnershipWarning("Couldn't disown {}".format(package)))
 
     def submit(self, f, category):
         """submit a package to CCR
@@ -312,15 +498,60 @@ class Session(object):
             "pkgsubmit": 1,
             "category": self._cat2number[category],
         }
-        files = {'pfile': open(f, "rb")}
-        response = self._session.post(CCR_SUBMIT, data=data, files=files)
-
-        error_message = re.search(error, response.text)
+        # the file is streamed from disk, never held in memory
+        with open(f, "rb") as pfile:
+            body = MultipartEncoder(data, {"pfile": (f, pfile)})
+            response = self._session.post(CCR_SUBMIT, data=body, headers={"Content-Type": body.content_type},
+                                          stream=True)
+
+        # the error message is read in full
+        marker, text = self._find(response, _SUBMIT_SCANNER, complete=_SUBMIT_ERROR)
+        _invalidate_missing()
+        error_message = re.search(error, text)
         if error_message:
             raise InvalidPackage(error_message.groupdict()["message"])
-        if "pkgbuild_view.php?p=" not in response.text:
+        if marker is None:
             raise _SubmitWarning("Couldn't submit {}".format(f))
 
+    def _fork(self):
+        """returns a Session with a copy of this one's login, sharing its
+        connection pool, for another thread - for internal use only
+        """
+        session = Session(verification=self.verification, transport=self._transport)
+        session._session.cookies.update(self._session.cookies)
+        session._username = self._username
+        session._logged_in_since = self._logged_in_since
+        return session
+
+    def submit_many(self, files, category, workers=SUBMIT_WORKERS):
+        """submit many packages to CCR, 'workers' uploads at a time
+        every worker thread uploads through its own copy of the session, a
+        Session being unsafe to share between threads
+        returns a dict mapping every file to None on success, or to the
+        InvalidPackage, CCRWarning, IOError or ConnectionError submit raised
+        raises KeyError on bad category
+        """
+        self._cat2number[category]
+        local = threading.local()
+        forks = []
+
+        def submit(f):
+            if not hasattr(local, "session"):
+                local.session = self._fork()
+                forks.append(local.session)
+            try:
+                local.session.submit(f, category)
+            except (InvalidPackage, CCRWarning, OSError) as e:
+                return e
+        files = list(dict.fromkeys(files))
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                return dict(zip(files, executor.map(submit, files)))
+        finally:
+            for session in forks:
+                session.close()
+
+    @_forgets_stale_id
     def delete(self, package):
         """delete a package from CCR
         raises a PackageNotFound exception if the package doesn't exist
@@ -328,11 +559,7 @@ class Session(object):
         raises a _DeleteWarning on failure
         """
         #FIXME Throw two exceptions if package doesn't exists
-        try:
-            pkginfo = info(package)
-            ccrid = pkginfo.ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         data = {
             "IDs[%s]" % ccrid: 1,
@@ -341,27 +568,21 @@ class Session(object):
             "confirm_Delete": 0,
         }
         self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(package, listed=True)
+        _forget_id(package)
 
         # test if the package still exists <==> delete wasn't succesful
-        # FIXME use _getccr for a quicker check, avoiding the need to catch the exception
-        try:
-            #FIXME Throw WARNING - Package couldn't be found
-            info(package)
-            raise _DeleteWarning("Couldn't delete {}".format(package))
-        except PackageNotFound:
-            pass  # everything works
+        self._verify(package, "delete", None, lambda: not self._exists(package),
+                     _DeleteWarning("Couldn't delete {}".format(package)))
 
+    @_forgets_stale_id
     def setcategory(self, package, category):
         """change/set the category of a package already in the CCR
         raises a PackageNotFound exception if the package doesn't exist
         raises a requests.ConnectionError if a network error occur
         raises _CategoryWarning for an invalid category or if it fails.
         """
-        try:
-            pkginfo = info(package)
-            ccrid = pkginfo.ID
-        except (ValueError, KeyError):
-            raise PackageNotFound(package)
+        ccrid = self._package_id(package)
 
         try:
             data = {
@@ -372,9 +593,79 @@ class Session(object):
             raise _CategoryWarning("Invalid category!")
 
         pkgurl = CCR_PKG + "?ID=" + ccrid
-        response = self._session.post(pkgurl, data=data)
+        response = self._session.post(pkgurl, data=data, stream=True)
+        _invalidate_cache(package)
 
         #FIXME find a more stable check
         checkstr = "selected='selected'>" + category + "</option>"
-        if checkstr not in response.text:
-            raise _CategoryWarning(response.text)
+        marker, text = self._find(response, Scanner([checkstr]))
+        if marker is None:
+            raise _CategoryWarning(text)
+
+    def _succeeded(self, action, before, after):
+        """tell from the package info before and after an action whether it
+        worked, None if the info can't show it - for internal use only
+        """
+        if action == "delete":
+            return after is None
+        if after is None:
+            return False
+        if action == "vote":
+            return int(after.NumVotes) > int(before.NumVotes)
+        if action == "unvote":
+            return int(after.NumVotes) < int(before.NumVotes)
+        if action == "flag":
+            return after.OutOfDate != "0"
+        if action == "unflag":
+            return after.OutOfDate != "1"
+        if action == "adopt":
+            return after.Maintainer == self._username
+        if action == "disown":
+            return after.MaintainerUID == "0"
+        return None
+
+    def bulk_action(self, action, packages):
+        """run action ("vote", "flag", "adopt", "delete"... see BULK_ACTIONS)
+        on many packages: one batched lookup, one POST per BULK_CHUNK packages
+        and one batched verification, following the verification policy:
+        VERIFY_DEFERRED leaves it to verify_pending, VERIFY_NONE skips it
+        returns a dict mapping every package to None on success, or to the
+        PackageNotFound or CCRWarning the single action would have raised
+        notify and unnotify can't be verified and always report success
+        raises KeyError on an unknown action
+        raises a ConnectionError if a network error occur
+        """
+        field, warning = BULK_ACTIONS[action]
+        found, missing = info_many(packages)
+        report = {package: PackageNotFound(package) for package in missing}
+        if action == "adopt":
+            for package, pkginfo in list(found.items()):
+                if pkginfo.MaintainerUID != "0":
+                    report[package] = _OwnershipWarning("Couldn't adopt {} : already maintained.".format(package))
+                    del found[package]
+
+        ids = [pkginfo.ID for pkginfo in found.values()]
+        for start in range(0, len(ids), BULK_CHUNK):
+            data = {"IDs[%s]" % ccrid: 1 for ccrid in ids[start:start + BULK_CHUNK]}
+            data[field] = 1
+            if action == "delete":
+                data["confirm_Delete"] = 0
+            self._session.post(CCR_PKG, data=data)
+        _invalidate_cache(*found, listed=action == "delete")
+        if action == "delete":
+            for package in found:
+                _forget_id(package)
+
+        if action in ("notify", "unnotify") or self.verification != VERIFY_STRICT:
+            for package, before in found.items():
+                if self.verification == VERIFY_DEFERRED and action in _ACTION_STATE:
+                    self._pending.append((package, action, before))
+                report[package] = None
+            return report
+        after = info_many(found)[0] if found else {}
+        for package, before in found.items():
+            if self._succeeded(action, before, after.get(package)) is False:
+                report[package] = warning("Couldn't {} {}".format(action, package))
+            else:
+                report[package] = None
+        return report
@@ -0,0 +1,165 @@
+"""A content-addressed local store for PKGBUILDs and package files
+
+files are kept once per content hash, however many packages or versions
+share them, and indexed by package and path in a sqlite database
+"""
+
+import contextlib
+import hashlib
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import ccr.ccr
+from ccr.ccr import file_raw_url
+
+__all__ = ["Store"]
+
+CCR_STORE = "ccr-store"
+# files at least this large are memory-mapped instead of read
+MMAP_THRESHOLD = 1024 * 1024
+
+
+class Store(object):
+    """PKGBUILDs and package files stored under 'directory'
+    max_size caps the total size of the stored files in bytes, the least
+    recently used are evicted first
+    """
+
+    def __init__(self, directory=CCR_STORE, max_size=None):
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (package TEXT, path TEXT, version TEXT, hash TEXT,
+                                              PRIMARY KEY (package, path));
+            CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+            CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER, used REAL);
+            CREATE INDEX IF NOT EXISTS objects_used ON objects (used);
+        """)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    def close(self):
+        """close the index"""
+        self.conn.close()
+
+    def _object_path(self, digest):
+        """returns the path of the object with hash digest - for internal use only"""
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    @property
+    def size(self):
+        """the total size of the stored files in bytes"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def _write(self, target, data):
+        """write an object through a temporary file of its own, so that the
+        threads and processes storing the same content don't clash - for
+        internal use only
+        """
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp, target)
+        except OSError:
+            os.unlink(temp)
+            # another writer stored the same content first
+            if not os.path.exists(target):
+                raise
+
+    def put(self, package, path, data, version=None):
+        """store data as the file 'path' of package, returns its hash"""
+        digest = hashlib.sha256(data).hexdigest()
+        target = self._object_path(digest)
+        if not os.path.exists(target):
+            self._write(target, data)
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?,?,?,?)", (package, path, version, digest))
+            self.conn.execute("INSERT OR REPLACE INTO objects VALUES (?,?,?)", (digest, len(data), time.time()))
+            self.conn.commit()
+        if self.max_size is not None:
+            self.prune(self.max_size)
+        return digest
+
+    def get(self, package, path, version=None):
+        """returns the stored file 'path' of package, None if it isn't stored
+        (or is stored for another version than 'version')
+        files over MMAP_THRESHOLD are returned as a read-only mmap, others as bytes
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT hash, version FROM files WHERE package=? AND path=?",
+                                    (package, path)).fetchone()
+            if row is None or (version is not None and row[1] != version):
+                return None
+            self.conn.execute("UPDATE objects SET used=? WHERE hash=?", (time.time(), row[0]))
+            self.conn.commit()
+        try:
+            with open(self._object_path(row[0]), "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size >= MMAP_THRESHOLD:
+                    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                return file.read()
+        except OSError:
+            # evicted by another process
+            return None
+
+    def prune(self, max_size=0):
+        """drop unreferenced files, then the least recently used ones until
+        the store is no larger than max_size bytes
+        returns the number of bytes freed
+        """
+        with self._lock:
+            orphans = self.conn.execute("SELECT hash, size FROM objects WHERE hash NOT IN "
+                                        "(SELECT hash FROM files)").fetchall()
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            evicted = list(orphans)
+            total -= sum(size for _, size in orphans)
+            if total > max_size:
+                for digest, size in self.conn.execute("SELECT hash, size FROM objects WHERE hash IN "
+                                                      "(SELECT hash FROM files) ORDER BY used"):
+                    evicted.append((digest, size))
+                    total -= size
+                    if total <= max_size:
+                        break
+            for digest, _ in evicted:
+                self.conn.execute("DELETE FROM files WHERE hash=?", (digest,))
+                self.conn.execute("DELETE FROM objects WHERE hash=?", (digest,))
+            self.conn.commit()
+        for digest, _ in evicted:
+            with contextlib.suppress(OSError):
+                os.remove(self._object_path(digest))
+        return sum(size for _, size in evicted)
+
+    def get_file(self, package, f, version=None, refresh=False):
+        """returns the file f of package, from the store if it has it for
+        'version' (any version if None), from the CCR otherwise
+        refresh=True always asks the CCR
+        raises a requests.HTTPError if the server answers with an error
+        raises a ConnectionError if a network error occur
+        """
+        if not refresh:
+            data = self.get(package, f, version)
+            if data is not None:
+                return data
+        with contextlib.closing(ccr.ccr.session.get(file_raw_url(package, f))) as response:
+            response.raise_for_status()
+            data = response.content
+        self.put(package, f, data, version)
+        return data
+
+    def get_pkgbuild(self, package, version=None, refresh=False):
+        """returns the PKGBUILD of package, see get_file"""
+        return self.get_file(package, "PKGBUILD", version, refresh)
@@ -0,0 +1,164 @@
+"""HTTP transport settings shared by the static functions and Session
+
+connections live in the adapter, cookies in each requests session, so
+anonymous and authenticated sessions mounting the same Transport safely
+share one connection pool
+"""
+
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from ccr import instrument
+
+__all__ = ["Transport"]
+
+# server errors worth retrying
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class _JitterRetry(Retry):
+    """Retry adding up to 'jitter' random seconds to the exponential backoff,
+    so that many clients failing together don't retry together
+    """
+    jitter = 0
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.jitter = self.jitter
+        return retry
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, self.jitter) if backoff else 0
+
+
+class _TransportAdapter(HTTPAdapter):
+    """HTTPAdapter applying a default timeout and a rate limit - for internal use only"""
+
+    def __init__(self, timeout, limiter=None, **kwargs):
+        self.timeout = timeout
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if self.limiter is not None:
+            self.limiter.acquire(request.method)
+        return super().send(request, **kwargs)
+
+    def close(self):
+        # the pool belongs to the Transport: closing one of the sessions
+        # mounting it must not drop the connections of the others
+        pass
+
+    def close_pool(self):
+        super().close()
+
+
+class _InstrumentedSession(requests.Session):
+    """requests session reporting its requests to the ccr.instrument hooks - for internal use only"""
+
+    def request(self, method, url, *args, **kwargs):
+        with instrument.timed("session", method, None, url) as event:
+            response = super().request(method, url, *args, **kwargs)
+            if event is not None:
+                event.record(response, kwargs.get("stream", False))
+            return response
+
+
+class Transport(object):
+    """connection pool, timeout and retry settings
+    pool_connections: number of hosts to keep connections to
+    pool_maxsize: connections kept per host
+    keep_alive: reuse connections between requests
+    connect_timeout, read_timeout: seconds, None waits forever
+    retries: attempts after a connection error, a reset or a 5xx answer,
+    waiting backoff_factor * 2 ** (attempt - 1) plus up to jitter seconds
+    between them; POSTs are only retried if they couldn't connect
+    limiter: a ccr.ratelimit.Limiter every request waits for
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, keep_alive=True,
+                 connect_timeout=10, read_timeout=30, retries=3,
+                 backoff_factor=0.5, jitter=0.5, limiter=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.limiter = limiter
+        self._adapter = None
+        self._lock = threading.Lock()
+
+    def replace(self, **settings):
+        """returns a new Transport with some settings changed"""
+        current = {name: value for name, value in vars(self).items() if not name.startswith("_")}
+        current.update(settings)
+        return Transport(**current)
+
+    @property
+    def adapter(self):
+        """the adapter holding the connection pool, created on first use"""
+        if self._adapter is None:
+            retry = _JitterRetry(total=self.retries, connect=self.retries, read=self.retries,
+                                 status=self.retries, status_forcelist=RETRY_STATUSES,
+                                 backoff_factor=self.backoff_factor, raise_on_status=False)
+            retry.jitter = self.jitter
+            self._adapter = _TransportAdapter((self.connect_timeout, self.read_timeout), self.limiter,
+                                              pool_connections=self.pool_connections,
+                                              pool_maxsize=self.pool_maxsize,
+                                              max_retries=retry)
+        return self._adapter
+
+    def resize(self, pool_connections=None, pool_maxsize=None):
+        """change the limits of the connection pool in place, for every
+        session mounting this transport; None keeps a limit unchanged
+        the connections of the former pool are closed once given back
+        """
+        with self._lock:
+            self._resize(pool_connections, pool_maxsize)
+
+    def grow(self, pool_maxsize):
+        """raise pool_maxsize to at least 'pool_maxsize', never lower it"""
+        with self._lock:
+            if pool_maxsize > self.pool_maxsize:
+                self._resize(None, pool_maxsize)
+
+    def _resize(self, pool_connections, pool_maxsize):
+        """resize, the lock being held - for internal use only"""
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if self._adapter is not None:
+            previous = self._adapter.poolmanager
+            self._adapter.init_poolmanager(self.pool_connections, self.pool_maxsize,
+                                           block=self._adapter._pool_block)
+            previous.clear()
+
+    def close(self):
+        """close the connections of the pool, which reopens on next use"""
+        if self._adapter is not None:
+            self._adapter.close_pool()
+
+    def mount(self, session):
+        """make a requests session use these settings and this transport's pool"""
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        elif session.headers.get("Connection") == "close":
+            del session.headers["Connection"]
+        return session
+
+    def session(self, instrumented=False):
+        """returns a new requests session using this transport
+        an instrumented session reports its requests to the ccr.instrument hooks
+        """
+        return self.mount(_InstrumentedSession() if instrumented else requests.Session())
@@ -1,5 +1,20 @@
-from ccrauth.authfile import AuthFile
-from ccrauth.authdb import AuthDB
-from ccrauth.authkwallet import AuthKWallet
+import importlib
+import logging
 
 __all__ = ['AuthFile', 'AuthDB', 'AuthKWallet', 'AuthFile.CCRAUTH_FLE', 'AuthDB.CCR_DB']
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# backend -> module, imported on first access so that 'import ccrauth'
+# doesn't probe for PyKDE4
+_BACKENDS = {
+    "AuthFile": "ccrauth.authfile",
+    "AuthDB": "ccrauth.authdb",
+    "AuthKWallet": "ccrauth.authkwallet",
+}
+
+
+def __getattr__(name):
+    if name in _BACKENDS:
+        return getattr(importlib.import_module(_BACKENDS[name]), name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
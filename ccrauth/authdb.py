@@ -1,8 +1,11 @@
+import json
 import sqlite3
 import logging
 import os
 from ccrauth.ccrauth import CCRAuth
 
+_logger = logging.getLogger(__name__)
+
 CCR_DB = 'ccr.db'
 
 
@@ -23,7 +26,7 @@ class AuthDB(CCRAuth):
             data = self.cur.fetchone()
             self._set_info(data[0], data[1])
         else:
-            logging.debug("Table auth doesn't exists in the database.")
+            _logger.debug("Table auth doesn't exists in the database.")
 
         self.conn.close()
 
@@ -44,3 +47,33 @@ class AuthDB(CCRAuth):
         self.cur.execute("DROP TABLE IF EXISTS auth")
         self.conn.commit()
         self.conn.close()
+
+    def load_cookies(self):
+        """ return the login cookies kept in the database, None if there are none
+        """
+        self.conn = sqlite3.connect(CCR_DB)
+        self.cur = self.conn.cursor()
+        self.cur.execute("SELECT * FROM sqlite_master WHERE type='table' AND name='cookies';")
+        row = None
+        if self.cur.fetchone() is not None:
+            self.cur.execute("SELECT record FROM cookies;")
+            row = self.cur.fetchone()
+        self.conn.close()
+        return json.loads(row[0]) if row is not None else None
+
+    def store_cookies(self, record):
+        """ store/update the login cookies in the database
+        """
+        self.conn = sqlite3.connect(CCR_DB)
+        self.cur = self.conn.cursor()
+        self.cur.execute("CREATE TABLE IF NOT EXISTS cookies (id INTEGER PRIMARY KEY, record TEXT)")
+        self.cur.execute("INSERT OR REPLACE INTO cookies (id, record) VALUES (0,?)", (json.dumps(record),))
+        self.conn.commit()
+        self.conn.close()
+
+    def delete_cookies(self):
+        self.conn = sqlite3.connect(CCR_DB)
+        self.cur = self.conn.cursor()
+        self.cur.execute("DROP TABLE IF EXISTS cookies")
+        self.conn.commit()
+        self.conn.close()
@@ -3,6 +3,8 @@ import logging
 import os
 from ccrauth.ccrauth import CCRAuth
 
+_logger = logging.getLogger(__name__)
+
 CCRAUTH_FILE = "ccrauth.txt"
 
 
@@ -19,7 +21,7 @@ class AuthFile(CCRAuth):
             with open(CCRAUTH_FILE) as file:
                 data = json.load(file)
         except OSError:
-            logging.debug("File ccrauth.txt cannot be opened.")
+            _logger.debug("File ccrauth.txt cannot be opened.")
             return
 
         self._set_info(data['username'], data['password'])
@@ -36,7 +38,7 @@ class AuthFile(CCRAuth):
             with open(CCRAUTH_FILE, 'w') as file:
                 json.dump(data, file)
         except OSError:
-            logging.debug("File ccrauth.txt cannot be opened.")
+            _logger.debug("File ccrauth.txt cannot be opened.")
             return
 
         self._set_info(username, password)
@@ -45,4 +47,38 @@ class AuthFile(CCRAuth):
         try:
             os.remove(CCRAUTH_FILE)
         except OSError:
-            logging.debug("File ccrauth.txt cannot be deleted.")
+            _logger.debug("File ccrauth.txt cannot be deleted.")
+
+    def load_cookies(self):
+        """ return the login cookies kept in the file, None if there are none
+        """
+        try:
+            with open(CCRAUTH_FILE) as file:
+                return json.load(file).get("cookies")
+        except (OSError, ValueError):
+            return None
+
+    def store_cookies(self, record):
+        """ keep the login cookies in the file, next to the credentials
+        """
+        try:
+            with open(CCRAUTH_FILE) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = {"username": self.username, "password": self.password}
+        data["cookies"] = record
+        try:
+            with open(CCRAUTH_FILE, 'w') as file:
+                json.dump(data, file)
+        except OSError:
+            _logger.debug("File ccrauth.txt cannot be opened.")
+
+    def delete_cookies(self):
+        try:
+            with open(CCRAUTH_FILE) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.pop("cookies", None) is not None:
+            with open(CCRAUTH_FILE, 'w') as file:
+                json.dump(data, file)
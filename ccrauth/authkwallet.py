@@ -6,6 +6,8 @@ except ImportError as e:
     # Handle below
 from ccrauth.ccrauth import CCRAuth
 
+_logger = logging.getLogger(__name__)
+
 
 class AuthKWallet(CCRAuth):
     """ A class to manage authentication information in KWallet"""
@@ -22,7 +24,7 @@ class AuthKWallet(CCRAuth):
 
         self.wallet = KWallet.Wallet.openWallet(KWallet.Wallet.LocalWallet(), 0)
         if not self.wallet.hasFolder("chakra-ccr"):
-            logging.debug("Folder chakra-ccr doesn't exists in KWallet.")
+            _logger.debug("Folder chakra-ccr doesn't exists in KWallet.")
             return
 
         self.wallet.setFolder("chakra-ccr")
@@ -26,3 +26,19 @@ class CCRAuth(object):
         """ remove authentication information
         reimplemented in AuthFile, AuthDB and AuthKWallet classes
         """
+
+    def load_cookies(self):
+        """ return the login cookies saved by store_cookies, None if there are none
+        reimplemented in AuthFile and AuthDB classes
+        """
+        return None
+
+    def store_cookies(self, record):
+        """ save the login cookies of a ccr.Session, a JSON serializable record
+        reimplemented in AuthFile and AuthDB classes, a no-op otherwise
+        """
+
+    def delete_cookies(self):
+        """ remove the login cookies
+        reimplemented in AuthFile and AuthDB classes
+        """
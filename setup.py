@@ -11,7 +11,7 @@ requires = requirements.strip().split('\n')
 
 setup(
     name = 'ccr',
-    packages = find_packages(),
+    packages = find_packages(exclude=['benchmarks']),
     install_requires=requires,
     version = __version__,
     author = 'ccr-tools',
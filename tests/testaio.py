@@ -0,0 +1,144 @@
+import asyncio
+from http.cookies import Morsel
+import types
+import unittest
+from unittest.mock import AsyncMock, Mock, PropertyMock, patch
+import ccr.aio
+from ccr.aio import *
+from ccr.session import _VoteWarning, _FlagWarning
+
+
+class TestAio(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.package = "pyccr-testing"
+        cls.mock_valid_return_values = '{"type":"mock","results":{"ID":"mock","Name":"%s", "OutOfDate":"%s"}}'
+        cls.mock_invalid_return_values = ['{"type":"mock"}', '{"type":"mock","results":"No result found"}']
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_info(self):
+        with patch.object(Client, "get_text", new_callable=AsyncMock) as get_text:
+            # should pass when a result is returned
+            get_text.return_value = self.mock_valid_return_values % (self.package, "0")
+            self.assertEqual(self.run_async(info(self.package)).Name, self.package)
+            # should raise PackageNotFound if the package couldn't be found
+            for value in self.mock_invalid_return_values:
+                get_text.return_value = value
+                self.assertRaises(PackageNotFound, self.run_async, info(self.package))
+
+    def test_search(self):
+        with patch.object(Client, "get_text", new_callable=AsyncMock) as get_text:
+            get_text.return_value = '{"type":"mock","results":[{"Name":"a"},{"Name":"b"}]}'
+            self.assertEqual(len(self.run_async(search("mock"))), 2)
+            self.assertEqual(len(self.run_async(list_orphans())), 2)
+            get_text.return_value = self.mock_invalid_return_values[0]
+            self.assertRaises(ValueError, self.run_async, search("mock"))
+            self.assertRaises(ValueError, self.run_async, msearch("mock"))
+
+    def test_concurrency(self):
+        # should never have more requests in flight than the concurrency cap
+        client = Client(concurrency=2)
+        running = []
+        peak = []
+
+        class FakeResponse(object):
+            async def __aenter__(self):
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                return self
+
+            async def __aexit__(self, *args):
+                running.pop()
+
+            async def text(self):
+                return "{}"
+
+        async def main():
+            client._semaphore = asyncio.Semaphore(2)
+            client._http = type("FakeHTTP", (), {"get": lambda self, url: FakeResponse()})()
+            await asyncio.gather(*[client.get_text("mock") for _ in range(10)])
+
+        with patch.object(Client, "_connect", lambda self: self._http):
+            self.run_async(main())
+        self.assertLessEqual(max(peak), 2)
+
+    def fake_aiohttp(self):
+        class CookieJar(list):
+            def update_cookies(self, cookies):
+                self.extend(cookies.values())
+
+        def session(connector, connector_owner=True, cookie_jar=None):
+            return Mock(connector=connector, cookie_jar=cookie_jar, close=AsyncMock())
+        return types.SimpleNamespace(TCPConnector=Mock(side_effect=lambda **kwargs: Mock()),
+                                     ClientSession=Mock(side_effect=session), CookieJar=CookieJar)
+
+    def test_connect(self):
+        client = Client()
+        fork = client.fork()
+
+        async def connect():
+            return client._connect(), fork._connect(), client._connect()
+
+        with patch.object(ccr.aio, "aiohttp", self.fake_aiohttp()):
+            http, forked, again = self.run_async(connect())
+            # should open the session once per event loop
+            self.assertIs(http, again)
+            self.assertIsNot(forked, http)
+            self.assertIs(forked.connector, http.connector)
+            # should not reuse the objects of a closed event loop, but keep the login
+            login = Morsel()
+            login.set("AURSID", "mock", "mock")
+            forked.cookie_jar.update_cookies({"AURSID": login})
+            http2, forked2, _ = self.run_async(connect())
+            self.assertIsNot(http2, http)
+            self.assertIsNot(http2.connector, http.connector)
+            self.assertIs(forked2.connector, http2.connector)
+            self.assertEqual(list(forked2.cookie_jar), [login])
+            forked.detach.assert_called_once_with()
+
+            # should give a fork the new connections once the shared ones were closed
+            async def reopen():
+                first = fork._connect()
+                await client.close()
+                second = fork._connect()
+                return first, second
+            first, second = self.run_async(reopen())
+            self.assertIsNot(second.connector, first.connector)
+            self.assertEqual(list(second.cookie_jar), [login])
+        # should raise ImportError without aiohttp
+        with patch.object(ccr.aio, "aiohttp", ImportError("aiohttp")):
+            self.assertRaises(ImportError, self.run_async, connect())
+            self.assertRaises(ImportError, self.run_async, Session().submit(__file__, "lib"))
+
+    def test_session(self):
+        session = Session()
+        valid = self.mock_valid_return_values
+        with patch.object(Client, "get_text", new_callable=AsyncMock) as get_text, \
+                patch.object(Client, "post_text", new_callable=AsyncMock):
+            # should pass if the server confirmation succeeds
+            get_text.side_effect = [valid % (self.package, "0"), valid % (self.package, "1")]
+            self.run_async(session.flag(self.package))
+            # should raise _FlagWarning if the server confirmation fails
+            get_text.side_effect = [valid % (self.package, "0"), valid % (self.package, "0")]
+            self.assertRaises(_FlagWarning, self.run_async, session.flag(self.package))
+            # should raise PackageNotFound if the package doesn't exist
+            get_text.side_effect = self.mock_invalid_return_values
+            self.assertRaises(PackageNotFound, self.run_async, session.flag(self.package))
+            # should raise _VoteWarning if the package is already voted
+            get_text.side_effect = [valid % (self.package, "0"), "class='button' name='do_UnVote'"]
+            self.assertRaises(_VoteWarning, self.run_async, session.vote(self.package))
+
+    def test_authenticate(self):
+        session = Session()
+        with patch.object(Client, "post_text", new_callable=AsyncMock), \
+                patch.object(Client, "cookies", new_callable=PropertyMock) as cookies:
+            # should pass if a cookie is created after a successful login
+            cookies.return_value = {"AURSID": "mock"}
+            self.run_async(session.authenticate("an0n", "ym0us"))
+            # should raise ValueError if the login failed
+            cookies.return_value = {}
+            self.assertRaises(ValueError, self.run_async, session.authenticate("an0n", "ym0us"))
@@ -0,0 +1,34 @@
+import unittest
+import ccr.ccr
+from ccr.ccr import info, search
+from benchmarks.server import *
+from benchmarks.suite import *
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_server(self):
+        with MockCCR(packages=20) as server, pointed_at(server.url):
+            self.assertEqual(ccr.ccr.CCR_RPC, server.url + "rpc.php?type=")
+            self.assertEqual(info("pkg00003").Name, "pkg00003")
+            self.assertEqual(len(search("pkg0001")), 10)
+            self.assertEqual(server.requests, 2)
+        # should restore the CCR urls
+        self.assertEqual(ccr.ccr.CCR_BASE, "https://chakralinux.org/ccr/")
+
+    def test_run(self):
+        results = run(iterations=2, concurrency=2, packages=50, only=["info", "vote", "unvote", "bulk_flag"])
+        self.assertEqual(list(results["results"]), ["info", "vote", "unvote", "bulk_flag"])
+        for result in results["results"].values():
+            self.assertEqual(result["ops"], 2)
+            self.assertEqual(result["errors"], 0)
+            self.assertLessEqual(result["p50"], result["p99"])
+        # should report what got slower
+        slower = {"results": {"info": dict(results["results"]["info"], p99=results["results"]["info"]["p99"] * 2)}}
+        self.assertEqual([(name, metric) for name, metric, _, _ in compare(results, slower)], [("info", "p99")])
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertIsNone(percentile([], 50))
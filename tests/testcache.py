@@ -0,0 +1,103 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+import ccr.ccr
+from ccr.ccr import Struct, Package, info, set_cache
+from ccr.cache import *
+from ccr.session import Session, VERIFY_NONE
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.backends = [MemoryBackend(maxsize=2),
+                         SQLiteBackend(os.path.join(self.tmpdir.name, "cache.db"), maxsize=2)]
+
+    def test_backends(self):
+        for backend in self.backends:
+            backend.set(("info", "a"), Struct(Name="a"), 1)
+            backend.set(("info", "b"), Struct(Name="b"), 2)
+            # should return stored values with their expiry
+            self.assertEqual(backend.get(("info", "a")), (1, {"Name": "a"}))
+            # should evict the least recently used entry
+            backend.set(("info", "c"), Struct(Name="c"), 3)
+            self.assertIsNone(backend.get(("info", "b")))
+            self.assertEqual(backend.get(("info", "a"))[1].Name, "a")
+            self.assertEqual(len(backend), 2)
+            backend.delete(("info", "a"))
+            self.assertIsNone(backend.get(("info", "a")))
+            backend.clear()
+            self.assertEqual(len(backend), 0)
+            # should keep compact Package rows like Structs
+            backend.set(("search", "d"), Struct(results=[Package({"Name": "d"})]), 4)
+            self.assertEqual(backend.get(("search", "d"))[1].results[0]["Name"], "d")
+
+    def test_ttl(self):
+        for backend in self.backends:
+            cache = ResponseCache(backend, ttls={"info": 60, "getlatest": -1})
+            cache.set("info", "a", Struct(Name="a"))
+            cache.set("getlatest", "10", Struct(results=[]))
+            cache.set("search", "a", Struct(results=[]))
+            # should return fresh entries and count hits and misses
+            self.assertEqual(cache.get("info", "a").Name, "a")
+            self.assertIsNone(cache.get("getlatest", "10"))
+            self.assertIsNone(cache.get("search", "a"))
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 2})
+            cache.invalidate("a")
+            self.assertIsNone(cache.get("info", "a"))
+            # should keep replies without results briefly, or not at all
+            cache.set("info", "new", Struct(type="error", results="No result found"))
+            self.assertIsNotNone(cache.get("info", "new"))
+            self.assertLessEqual(backend.get(("info", "new"))[0], time.time() + NEGATIVE_TTL)
+            ResponseCache(backend, negative_ttl=0).set("info", "gone", Struct(results="No result found"))
+            self.assertIsNone(backend.get(("info", "gone")))
+            # should drop the listings of a deleted package
+            cache.ttls["search"] = 60
+            cache.set("search", "a", Struct(results=[Struct(Name="a"), Struct(Name="b")]))
+            cache.set("search", "b", Struct(results=[Struct(Name="b")]))
+            cache.invalidate("a", listed=True)
+            self.assertIsNone(cache.get("search", "a"))
+            self.assertIsNotNone(cache.get("search", "b"))
+            # should drop what may miss a submitted package
+            cache.set("info", "a", Struct(Name="a"))
+            cache.invalidate_missing()
+            self.assertIsNone(cache.get("search", "b"))
+            self.assertIsNone(cache.get("info", "new"))
+            self.assertIsNotNone(cache.get("info", "a"))
+
+    def test_get_ccr_json(self):
+        cache = ResponseCache()
+        set_cache(cache)
+        try:
+            with patch.object(ccr.ccr, "session", Mock()) as session:
+                session.get.return_value.content = b'{"type":"info","results":{"ID":"1","Name":"mock","OutOfDate":"0"}}'
+                # should only hit the network once for the same query
+                info("mock")
+                self.assertEqual(info("mock").Name, "mock")
+                self.assertEqual(session.get.call_count, 1)
+                # should drop the entry when a Session action changes the package
+                s = Session()
+                s._session.post = Mock()
+                session.get.return_value.content = b'{"type":"info","results":{"ID":"1","Name":"mock","OutOfDate":"1"}}'
+                s.flag("mock")
+                self.assertEqual(session.get.call_count, 2)
+                self.assertEqual(info("mock").OutOfDate, "1")
+                s.close()
+                # should not list a deleted package anymore
+                session.get.return_value.content = b'{"type":"search","results":[{"ID":"1","Name":"mock"}]}'
+                ccr.ccr.search("mock")
+                s = Session(verification=VERIFY_NONE)
+                s._session.post = Mock()
+                s.delete("mock")
+                session.get.return_value.content = b'{"type":"search","results":"No result found"}'
+                self.assertEqual(ccr.ccr.search("mock"), "No result found")
+                s.close()
+        finally:
+            set_cache(None)
+
+    def tearDown(self):
+        self.backends[1].close()
+        self.tmpdir.cleanup()
@@ -1,8 +1,15 @@
+import copy
 import inspect
+import pickle
+import sys
+import threading
+import time
 import unittest
 from unittest.mock import *
 import requests
 from ccr.ccr import *
+from ccr.ccr import Struct
+import ccr.ccr
 
 
 class TestCCRStatic(unittest.TestCase):
@@ -29,6 +36,8 @@ class TestCCRStatic(unittest.TestCase):
         cls.mock_valid_return_values = '{"type":"mock","results":{"ID":"%s","Name":"%s"}}'
         cls.mock_invalid_return_values = ['{"type":"mock"}', '{"type":"mock","results":"No result found"}']
         requests.get = Mock()
+        # the RPC responses are decoded from bytes
+        type(requests.get.return_value).content = PropertyMock(side_effect=lambda: requests.get.return_value.text.encode())
 
     def test_search(self):
         #should pass when a result is returned
@@ -40,6 +49,27 @@ class TestCCRStatic(unittest.TestCase):
             requests.get.return_value.text = self.mock_invalid_return_values[0]
             self.assertRaises(ValueError, search, packagename)
 
+    def test_iter_search(self):
+        body = ('{"type":"search","results":[%s]}' % ",".join(
+            '{"ID":"%d","Name":"%s"}' % (i, name) for i, name in enumerate(self.known_values))).encode()
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            #should yield every result, whatever the chunk boundaries
+            for size in (1, 5, len(body)):
+                session.get.return_value.iter_content.return_value = [body[i:i + size] for i in range(0, len(body), size)]
+                self.assertEqual([r.Name for r in iter_search("mock")], list(self.known_values))
+            #should yield compact Package rows on demand
+            results = list(iter_msearch(self.maintainer, record=Package))
+            self.assertIsInstance(results[0], Package)
+            self.assertEqual(results[1].ID, "1")
+            self.assertEqual(results[1]["Name"], "ls++-git")
+            #should survive copies and pickling
+            for copied in (copy.copy(results[1]), copy.deepcopy(results[1]), pickle.loads(pickle.dumps(results[1]))):
+                self.assertEqual(copied, results[1])
+                self.assertEqual(copied.Name, "ls++-git")
+            #should raises ValueError if data returned from server are invalid
+            session.get.return_value.iter_content.return_value = [self.mock_invalid_return_values[0].encode()]
+            self.assertRaises(ValueError, list, iter_search("mock"))
+
     def test_info(self):
         #should pass when a result is returned
         for packagename in self.known_values:
@@ -54,6 +84,111 @@ class TestCCRStatic(unittest.TestCase):
             requests.get.return_value.text = self.mock_invalid_return_values[0]
             self.assertRaises(PackageNotFound, info, packagename)
 
+    def test_info_many(self):
+        names = list(self.known_values) + ["mock"]
+        rows = [Struct(Name=name, ID="1") for name in self.known_values]
+        #should return found packages and report missing ones separately
+        with patch("ccr.ccr._get_ccr_json", return_value=Struct(type="multiinfo", results=rows)):
+            found, missing = info_many(names)
+        self.assertEqual(sorted(found), sorted(self.known_values))
+        self.assertEqual(missing, ["mock"])
+        #should send the packages in chunks
+        with patch("ccr.ccr._get_ccr_json", return_value=Struct(type="multiinfo", results=[])) as get:
+            info_many(names, chunk_size=2)
+        self.assertEqual(get.call_count, 2)
+        #should keep batching after a chunk without any hit
+        for reply in (Struct(type="multiinfo", results="No result found"),
+                      Struct(type="error", results="No result found")):
+            with patch("ccr.ccr._get_ccr_json", return_value=reply) as get:
+                found, missing = info_many(names, chunk_size=1)
+            self.assertEqual(get.call_count, len(names))
+            self.assertEqual(missing, names)
+        #should fall back to single info calls if multiinfo isn't supported
+        replies = {"cdrtools": Struct(type="info", results=rows[0]),
+                   "ls++-git": Struct(type="info", results=rows[1]),
+                   "mock": Struct(type="info", results="No result found")}
+        with patch("ccr.ccr._get_ccr_json",
+                   side_effect=lambda method, arg: Struct(type="error", results="Incorrect request type specified.")
+                   if method == "multiinfo" else replies[arg]):
+            found, missing = info_many(names)
+        self.assertEqual(sorted(found), sorted(self.known_values))
+        self.assertEqual(missing, ["mock"])
+
+    def test_package(self):
+        row = {"ID": "2745", "Name": "cdrtools", "NumVotes": "12", "OutOfDate": "1", "Extra": "mock"}
+        package = Package(row)
+        #should behave like a Struct
+        self.assertEqual(package.ID, "2745")
+        self.assertEqual(package["Name"], "cdrtools")
+        self.assertEqual(package.Extra, "mock")
+        self.assertEqual(package, row)
+        self.assertRaises(KeyError, getattr, package, "Version")
+        self.assertIsNone(package.get("Version"))
+        #should convert numeric fields on demand
+        self.assertEqual(package.num_votes, 12)
+        self.assertEqual(package.out_of_date, 1)
+        #should be returned by the static functions on demand
+        with patch("ccr.ccr._get_ccr_json", return_value=Struct(type="info", results=Struct(row))):
+            self.assertIsInstance(info("cdrtools", record=Package), Package)
+        with patch("ccr.ccr._get_ccr_json", return_value=Struct(type="search", results=[Struct(row)])):
+            self.assertIsInstance(search("cdrtools", record=Package)[0], Package)
+            self.assertIsInstance(msearch(self.maintainer, record=Package)[0], Package)
+
+    def test_single_flight(self):
+        release = threading.Event()
+        results = []
+
+        def slow_get(url):
+            release.wait(1)
+            return Mock(content=self.mock_valid_return_values.replace("%s", "cdrtools").encode())
+
+        def lookup():
+            try:
+                results.append(info("cdrtools"))
+            except Exception as e:
+                results.append(e)
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            #should send one request for concurrent identical calls
+            session.get.side_effect = slow_get
+            threads = [threading.Thread(target=lookup) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            release.set()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(session.get.call_count, 1)
+            self.assertTrue(all(result is results[0] for result in results))
+            #should send a new request once the previous one is done
+            info("cdrtools")
+            self.assertEqual(session.get.call_count, 2)
+            #should raise the error of the shared request in every caller
+            release.clear()
+            results.clear()
+            session.get.side_effect = lambda url: release.wait(1) and Mock(content=self.mock_invalid_return_values[0].encode())
+            threads = [threading.Thread(target=lookup) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            release.set()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(session.get.call_count, 3)
+            self.assertTrue(all(isinstance(result, PackageNotFound) for result in results))
+
+    def test_decode(self):
+        body = '{"type":"search","results":[{"Name":"caf\u00e9","Deps":{"a":[1,{"b":"2"}]}}]}'.encode()
+        decoded = []
+        # should give the same Structs with orjson or the json module
+        for backend in ({}, {"orjson": None}):
+            with patch.dict(sys.modules, backend), patch.object(ccr.ccr, "_loads", None):
+                results = ccr.ccr._decode(body)
+                self.assertEqual(results.results[0].Name, "caf\u00e9")
+                self.assertEqual(results.results[0].Deps.a[1].b, "2")
+                self.assertRaises(ValueError, ccr.ccr._decode, b'{"type":')
+                decoded.append(results)
+        self.assertEqual(decoded[0], decoded[1])
+
     def test_msearch(self):
         #should pass when a result is returned
         requests.get.return_value.text = self.mock_valid_return_values
@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from ccr.session import Session
+from ccr.cookies import *
+import ccrauth.authdb
+import ccrauth.authfile
+from benchmarks.server import MockCCR, pointed_at
+
+
+class TestCookies(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCCR(packages=20).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cookies.json")
+        self.urls = pointed_at(self.server.url)
+        self.urls.__enter__()
+
+    def tearDown(self):
+        self.urls.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def logins(self, store, password="mock", rememberme=False):
+        before = len(self.server._sessions)
+        with Session("mock", password, rememberme, cookies=store) as session:
+            session.flag("pkg00001")
+        return len(self.server._sessions) - before
+
+    def test_cookie_file(self):
+        store = CookieFile(self.path)
+        # should log in once, then reuse the saved cookie
+        self.assertEqual(self.logins(store), 1)
+        self.assertEqual(self.logins(store, password=None), 0)
+        self.assertEqual(store.load_cookies()["username"], "mock")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        # should not reuse the login of someone else
+        self.assertRaises(ValueError, Session, "other", None, cookies=store)
+        # should log in again once the login expired
+        record = store.load_cookies()
+        record["saved"] -= SESSION_TIMEOUT
+        store.store_cookies(record)
+        self.assertEqual(self.logins(store), 1)
+        self.assertRaises(ValueError, Session, "mock", None, cookies=CookieFile(self.path + ".missing"))
+
+    def test_dropped_login(self):
+        store = CookieFile(self.path)
+        self.assertEqual(self.logins(store), 1)
+        saved = store.load_cookies()["saved"]
+        # should check the saved login with a single request
+        before = self.server.requests
+        Session("mock", None, cookies=store).close()
+        self.assertEqual(self.server.requests - before, 1)
+        # should keep when the login was made
+        self.assertEqual(store.load_cookies()["saved"], saved)
+        # should log in again once the CCR dropped the login
+        self.server.logout_all()
+        self.assertEqual(self.logins(store), 1)
+        self.server.logout_all()
+        self.assertRaises(ValueError, Session, "mock", None, cookies=store)
+
+    def test_remember_me(self):
+        store = CookieFile(self.path)
+        self.assertEqual(self.logins(store, rememberme=True), 1)
+        record = store.load_cookies()
+        # should trust the expiry sent by the server
+        self.assertGreater(record["cookies"][0]["expires"], time.time() + SESSION_TIMEOUT)
+        record["saved"] -= SESSION_TIMEOUT
+        store.store_cookies(record)
+        self.assertEqual(self.logins(store), 0)
+
+    def test_auth_backends(self):
+        with patch.object(ccrauth.authdb, "CCR_DB", os.path.join(self.tmpdir.name, "ccr.db")), \
+                patch.object(ccrauth.authfile, "CCRAUTH_FILE", os.path.join(self.tmpdir.name, "ccrauth.txt")):
+            for backend in (ccrauth.authdb.AuthDB, ccrauth.authfile.AuthFile):
+                auth = backend()
+                auth.store_auth_info("mock", "mock")
+                self.assertIsNone(auth.load_cookies())
+                self.assertEqual(self.logins(auth), 1)
+                self.assertEqual(self.logins(backend(), password=None), 0)
+                # should keep the credentials next to the cookies
+                self.assertEqual((backend().username, backend().password), ("mock", "mock"))
+                auth.delete_cookies()
+                self.assertIsNone(auth.load_cookies())
+            with open(ccrauth.authfile.CCRAUTH_FILE) as f:
+                self.assertEqual(json.load(f), {"username": "mock", "password": "mock"})
@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import ccr.ccr
+from ccr.ccr import Struct
+from ccr.deps import *
+from ccr.store import Store
+
+PKGBUILD = """
+pkgname=mock
+depends=('qt>=4.8' "libfoo"
+         bar  # a comment
+)
+makedepends=(cmake)
+optdepends=('docs: not a dependency')
+provides=('mock-git=1.0')
+conflicts=(mock-git)
+"""
+
+
+class TestDeps(unittest.TestCase):
+
+    def graph(self, **deps):
+        graph = DependencyGraph()
+        for name, depends in deps.items():
+            graph.add(name, dict(depends=depends, makedepends=[], provides=[], conflicts=[]))
+        return graph
+
+    def test_parse_pkgbuild(self):
+        parsed = parse_pkgbuild(PKGBUILD)
+        self.assertEqual(parsed["depends"], ["qt", "libfoo", "bar"])
+        self.assertEqual(parsed["makedepends"], ["cmake"])
+        self.assertEqual(parsed["provides"], ["mock-git"])
+        self.assertEqual(parsed["conflicts"], ["mock-git"])
+
+    def test_parse_many(self):
+        # should keep the input order
+        results = parse_many([PKGBUILD, "depends=(a)", "depends=(b c)"], processes=2)
+        self.assertEqual([r["depends"] for r in results], [["qt", "libfoo", "bar"], ["a"], ["b", "c"]])
+
+    def test_graph(self):
+        graph = self.graph(app=["lib", "qt"], lib=["base"], base=[], tool=["lib"])
+        # should ignore dependencies outside the CCR
+        self.assertEqual(graph.depends_on("app"), {"lib"})
+        self.assertEqual(graph.required_by("lib"), {"app", "tool"})
+        order = graph.build_order()
+        for package, dep in (("app", "lib"), ("lib", "base"), ("tool", "lib")):
+            self.assertLess(order.index(dep), order.index(package))
+        # should add the dependencies of the requested packages
+        self.assertEqual(graph.build_order(["lib"]), ["base", "lib"])
+        # should raise ValueError on circular dependencies
+        graph.add("base", dict(depends=["app"], makedepends=[], provides=[], conflicts=[]))
+        self.assertRaises(ValueError, graph.build_order)
+
+    def test_provides(self):
+        graph = self.graph(app=["mock"])
+        graph.add("mock-git", dict(depends=[], makedepends=[], provides=["mock"], conflicts=[]))
+        self.assertEqual(graph.required_by("mock-git"), {"app"})
+
+    @patch("ccr.deps._fetch_pkgbuild")
+    def test_update(self, fetch):
+        fetch.side_effect = lambda name, store, modified: "depends=(lib)" if name == "app" else "depends=()"
+        packages = [Struct(Name="app", LastModified="1"), Struct(Name="lib", LastModified="1")]
+        graph = DependencyGraph()
+        self.assertEqual(graph.update(packages), {})
+        self.assertEqual(graph.depends_on("app"), {"lib"})
+        # should only fetch the packages that changed
+        packages[1] = Struct(Name="lib", LastModified="2")
+        graph.update(packages)
+        self.assertEqual(fetch.call_count, 3)
+        self.assertEqual(fetch.call_args[0][0], "lib")
+
+    def test_update_store(self):
+        pkgbuilds = {"app": b"depends=(lib)", "lib": b"depends=()"}
+        with tempfile.TemporaryDirectory() as tmpdir, Store(tmpdir) as store, \
+                patch.object(ccr.ccr, "session", Mock()) as session:
+            session.get.side_effect = lambda url: Mock(content=pkgbuilds[url.split("/")[-2]])
+            graph = DependencyGraph()
+            graph.update([Struct(Name="app", LastModified=1), Struct(Name="lib", LastModified=1)], store)
+            self.assertEqual(graph.depends_on("app"), {"lib"})
+            # should not take the stored PKGBUILD of the previous upload
+            pkgbuilds["app"] = b"depends=()"
+            graph.update([Struct(Name="app", LastModified=2)], store)
+            self.assertEqual(graph.depends_on("app"), set())
+            self.assertEqual(session.get.call_count, 3)
+            # should reuse the stored PKGBUILD of the same upload
+            DependencyGraph().update([Struct(Name="app", LastModified=2)], store)
+            self.assertEqual(session.get.call_count, 3)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import ccr.ccr
+from ccr.ccr import pkg_url
+from ccr.download import *
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cdrtools.tar.gz")
+        self.body = b"0123456789" * 1000
+        self.checksum = hashlib.sha256(self.body).hexdigest()
+
+    def response(self, status, body, headers=None):
+        response = Mock(status_code=status, headers=headers or {"ETag": '"v1"'})
+        response.iter_content.return_value = [body[i:i + 100] for i in range(0, len(body), 100)]
+        return response
+
+    def test_download(self):
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            # should stream the file to disk and verify it
+            session.get.return_value = self.response(200, self.body)
+            download("mock", self.path, self.checksum)
+            with open(self.path, "rb") as file:
+                self.assertEqual(file.read(), self.body)
+            # should not download a file matching its checksum again
+            download("mock", self.path, self.checksum)
+            self.assertEqual(session.get.call_count, 1)
+
+    def test_resume(self):
+        part = self.path + ".part"
+        with open(part, "wb") as file:
+            file.write(self.body[:4000])
+        with open(part + ".validators", "w") as file:
+            json.dump({"ETag": '"v1"', "Last-Modified": "Sat, 01 Jan 2000 00:00:00 GMT"}, file)
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            # should only ask for the missing part of the same file
+            session.get.return_value = self.response(206, self.body[4000:])
+            download("mock", self.path, self.checksum)
+            self.assertEqual(session.get.call_args[1]["headers"], {"Range": "bytes=4000-", "If-Range": '"v1"'})
+            with open(self.path, "rb") as file:
+                self.assertEqual(file.read(), self.body)
+            self.assertFalse(os.path.exists(part))
+            self.assertFalse(os.path.exists(part + ".validators"))
+
+    def test_resume_changed(self):
+        part = self.path + ".part"
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            # should start over without validators to resume against
+            with open(part, "wb") as file:
+                file.write(b"old version")
+            session.get.return_value = self.response(200, self.body)
+            download("mock", self.path, self.checksum)
+            self.assertEqual(session.get.call_args[1]["headers"], {})
+            # should start over when the file changed on the server
+            with open(part, "wb") as file:
+                file.write(b"old version")
+            with open(part + ".validators", "w") as file:
+                json.dump({"Last-Modified": "Sat, 01 Jan 2000 00:00:00 GMT"}, file)
+            os.remove(self.path)
+            download("mock", self.path, self.checksum)
+            self.assertEqual(session.get.call_args[1]["headers"]["If-Range"], "Sat, 01 Jan 2000 00:00:00 GMT")
+            with open(self.path, "rb") as file:
+                self.assertEqual(file.read(), self.body)
+            # should discard the partial file if it is past the end of the new one
+            with open(part, "wb") as file:
+                file.write(self.body + b"old")
+            with open(part + ".validators", "w") as file:
+                json.dump({"ETag": '"v1"'}, file)
+            os.remove(self.path)
+            session.get.side_effect = [self.response(416, b""), self.response(200, self.body)]
+            download("mock", self.path, self.checksum)
+            self.assertEqual(session.get.call_args[1]["headers"], {})
+            with open(self.path, "rb") as file:
+                self.assertEqual(file.read(), self.body)
+
+    def test_checksum(self):
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            # should raise ChecksumMismatch and drop the bad file
+            session.get.return_value = self.response(200, b"mock")
+            self.assertRaises(ChecksumMismatch, download, "mock", self.path, self.checksum)
+            self.assertFalse(os.path.exists(self.path))
+            self.assertFalse(os.path.exists(self.path + ".part"))
+
+    def test_download_many(self):
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            session.get.return_value = self.response(200, self.body)
+            # should report a result for every package
+            results = dict(download_many(["cdrtools", "mock"], self.tmpdir.name,
+                                         checksums={"mock": "0"}))
+            self.assertEqual(results["cdrtools"], self.path)
+            self.assertIsInstance(results["mock"], ChecksumMismatch)
+            self.assertIn(pkg_url("cdrtools"), [call[0][0] for call in session.get.call_args_list])
+
+    @patch("time.sleep")
+    def test_bandwidth(self, sleep):
+        bandwidth = Bandwidth(1000)
+        # should let a burst of up to one second of traffic through
+        bandwidth.consume(1000)
+        self.assertFalse(sleep.called)
+        # should then sleep for as long as the rate requires
+        bandwidth.consume(500)
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.5, places=1)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import ccr.ccr
+from ccr.ccr import pkgbuild_raw_url
+from ccr.fetch import *
+
+
+class TestFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.package = "cdrtools"
+        self.path = os.path.join(self.tmpdir.name, self.package, "PKGBUILD")
+
+    def response(self, status, body=b"", headers=None):
+        response = Mock(status_code=status, headers=headers or {})
+        response.iter_content.return_value = [body]
+        return response
+
+    def test_fetch(self):
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            # should download the file and store its validators
+            session.get.return_value = self.response(200, b"pkgname=cdrtools",
+                                                     {"ETag": '"abc"', "Last-Modified": "mock"})
+            result = fetch_pkgbuild(self.package, self.tmpdir.name)
+            self.assertEqual(result, FetchResult(self.path, True, 200))
+            self.assertEqual(session.get.call_args[0][0], pkgbuild_raw_url(self.package))
+            with open(self.path, "rb") as file:
+                self.assertEqual(file.read(), b"pkgname=cdrtools")
+            # should send the validators and keep the local copy on 304
+            session.get.return_value = self.response(304)
+            result = fetch_pkgbuild(self.package, self.tmpdir.name)
+            self.assertFalse(result.modified)
+            self.assertEqual(session.get.call_args[1]["headers"],
+                             {"If-None-Match": '"abc"', "If-Modified-Since": "mock"})
+            with open(self.path, "rb") as file:
+                self.assertEqual(file.read(), b"pkgname=cdrtools")
+            # should not send validators if the local copy is gone
+            os.remove(self.path)
+            session.get.return_value = self.response(200, b"pkgname=cdrtools")
+            fetch_pkgbuild(self.package, self.tmpdir.name)
+            self.assertEqual(session.get.call_args[1]["headers"], {})
+
+    def test_fetch_many(self):
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            session.get.return_value = self.response(304)
+            # should report a result for every package
+            results = dict(fetch_many(["a", "b"], self.tmpdir.name, fetcher=fetch_pkg))
+            self.assertEqual(sorted(results), ["a", "b"])
+            self.assertFalse(results["a"].modified)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from ccr.ccr import (search, iter_search, iter_msearch, info, msearch, latest, url, set_id_index,
+                     set_offline, Package, PackageNotFound)
+from ccr.mirror import Mirror
+from ccr.session import Session, CCRWarning, VERIFY_NONE
+from ccr.ids import *
+from benchmarks.server import MockCCR, pointed_at
+
+
+class TestIds(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockCCR(packages=30).start()
+        self.urls = pointed_at(self.server.url)
+        self.urls.__enter__()
+        self.index = IdIndex()
+        set_id_index(self.index)
+
+    def tearDown(self):
+        set_id_index(None)
+        self.urls.__exit__(None, None, None)
+        self.server.stop()
+
+    def requests(self, func, *args):
+        before = self.server.requests
+        func(*args)
+        return self.server.requests - before
+
+    def test_index(self):
+        # should learn the IDs from every query
+        search("pkg0001")
+        self.assertEqual(len(self.index), 10)
+        latest(3)
+        self.assertEqual(self.index.get("pkg00029"), "30")
+        info("pkg00003")
+        self.assertEqual(self.index.get("pkg00003"), "4")
+        # should skip the info lookup of the actions
+        self.assertEqual(self.requests(url, "pkg00003"), 0)
+        with Session("mock", "mock", verification=VERIFY_NONE) as session:
+            self.assertEqual(self.requests(session.flag, "pkg00003"), 1)
+            self.assertEqual(self.requests(session.check_vote, "pkg00011"), 1)
+            self.assertEqual(self.requests(session.notify, "pkg00011"), 1)
+            self.assertEqual(self.requests(session.notify, "pkg00004"), 2)
+            # should forget deleted packages
+            session.delete("pkg00003")
+            self.assertIsNone(self.index.get("pkg00003"))
+            self.assertRaises(PackageNotFound, session.flag, "pkg00003")
+
+    def test_stale(self):
+        info("pkg00005")
+        with Session("mock", "mock") as session:
+            # deleted behind our back: the action fails and the ID is dropped
+            session.delete("pkg00005")
+            self.index.update([("pkg00005", "6")])
+            self.assertRaises(PackageNotFound, session.flag, "pkg00005")
+            self.assertIsNone(self.index.get("pkg00005"))
+            # should keep the ID when the package is there
+            info("pkg00006")
+            session.vote("pkg00006")
+            self.assertRaises(CCRWarning, session.vote, "pkg00006")
+            self.assertEqual(self.index.get("pkg00006"), "7")
+
+    def test_streamed_and_offline(self):
+        # should learn the IDs of streamed results, even if not all are read
+        rows = iter_search("pkg0001", record=Package)
+        next(rows)
+        rows.close()
+        self.assertEqual(self.index.get("pkg00010"), "11")
+        self.assertEqual(len(list(iter_msearch("0"))), 3)
+        self.assertEqual(self.index.get("pkg00020"), "21")
+        # should learn the IDs of the results of the mirror
+        self.index.clear()
+        mirror = Mirror(":memory:")
+        mirror.store(search("pkg0002"))
+        self.index.clear()
+        set_offline(mirror)
+        try:
+            search("pkg00021")
+            self.assertEqual(self.index.get("pkg00021"), "22")
+            info("pkg00022")
+            msearch("0")
+            self.assertEqual(self.index.get("pkg00020"), "21")
+            self.assertEqual(len(self.index), 3)
+        finally:
+            set_offline(None)
+
+    def test_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "ids.db")
+            index = IdIndex(path)
+            index.update([("one", "1"), ("two", "2")])
+            index.forget("two")
+            index.close()
+            # should keep the IDs between processes
+            index = IdIndex(path)
+            self.assertEqual(index.get("one"), "1")
+            self.assertIsNone(index.get("two"))
+            index.clear()
+            self.assertEqual(len(index), 0)
+            index.close()
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# seconds 'import ccr, ccrauth' may take in a fresh interpreter
+IMPORT_BUDGET = 0.15
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import ccr, ccrauth
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+class TestImport(unittest.TestCase):
+
+    def probe(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, "-c", PROBE], cwd=root)
+        return json.loads(output.decode("utf-8"))
+
+    def test_lazy_imports(self):
+        modules = self.probe()["modules"]
+        # should leave requests, the backends and the submodules for later
+        for module in ("requests", "urllib3", "ccr.transport", "ccr.parallel", "ccr.aio",
+                       "ccrauth.authfile", "ccrauth.authdb", "ccrauth.authkwallet"):
+            self.assertNotIn(module, modules)
+
+    def test_import_budget(self):
+        # best of three, the first run may have to compile the modules
+        elapsed = min(self.probe()["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_BUDGET)
+
+    def test_lazy_attributes(self):
+        import ccr
+        import ccr.ccr
+        import ccrauth
+        from ccrauth.authfile import AuthFile
+        self.assertIs(ccrauth.AuthFile, AuthFile)
+        self.assertEqual(ccr.parallel.__name__, "ccr.parallel")
+        self.assertIs(ccr.ccr.session, ccr.ccr._get_session())
+        self.assertRaises(AttributeError, getattr, ccr, "nothing")
+        self.assertRaises(AttributeError, getattr, ccrauth, "nothing")
@@ -0,0 +1,73 @@
+import unittest
+from ccr.ccr import info, search, PackageNotFound, get_transport, set_transport
+from ccr.session import Session
+from ccr.instrument import *
+from benchmarks.server import MockCCR, pointed_at
+
+
+class TestInstrument(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCCR(packages=20).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_hooks(self):
+        before, after = [], []
+        handle = add_hook(before.append, after.append)
+        try:
+            with pointed_at(self.server.url):
+                info("pkg00001")
+                with Session("mock", "mock") as session:
+                    session.flag("pkg00001")
+        finally:
+            remove_hook(handle)
+        self.assertEqual([(e.kind, e.method) for e in after],
+                         [("rpc", "info"), ("session", "POST"), ("rpc", "info"),
+                          ("session", "POST"), ("rpc", "info")])
+        self.assertEqual(before, after)
+        event = after[0]
+        self.assertEqual((event.arg, event.status, event.endpoint), ("pkg00001", 200, "rpc.php"))
+        self.assertGreater(event.bytes, 0)
+        self.assertGreaterEqual(event.total, event.ttfb)
+        self.assertGreaterEqual(event.total, event.parse)
+        self.assertIsNone(after[1].parse)
+        self.assertEqual(after[3].endpoint, "packages.php")
+        # should stop calling removed hooks
+        with pointed_at(self.server.url):
+            info("pkg00001")
+        self.assertEqual(len(after), 5)
+
+    def test_collector(self):
+        collector = Collector(buckets=(0.5, 60)).install()
+        broken = add_hook(post=lambda event: 1 / 0)
+        transport = get_transport()
+        try:
+            with pointed_at(self.server.url), self.assertLogs(level="ERROR"):
+                search("pkg")
+                self.assertRaises(PackageNotFound, info, "missing")
+            # should report failed calls and survive broken hooks
+            set_transport(transport.replace(retries=0))
+            with pointed_at("http://127.0.0.1:1/ccr/"), self.assertLogs(level="ERROR"):
+                self.assertRaises(Exception, info, "pkg00001")
+        finally:
+            set_transport(transport)
+            collector.uninstall()
+            remove_hook(broken)
+        metrics = collector.as_dict()
+        requests = {(m["labels"]["method"], m["labels"]["status"]): m["value"]
+                    for m in metrics["ccr_requests_total"]}
+        self.assertEqual(requests, {("search", 200): 1, ("info", 200): 1, ("info", ""): 1})
+        self.assertEqual([m["value"] for m in metrics["ccr_errors_total"]], [1])
+        seconds = {m["labels"]["method"]: m for m in metrics["ccr_request_seconds"]}
+        self.assertEqual(seconds["info"]["count"], 2)
+        self.assertEqual(seconds["info"]["buckets"]["+Inf"], 2)
+        text = collector.prometheus()
+        self.assertIn("# TYPE ccr_request_seconds histogram", text)
+        self.assertIn('ccr_requests_total{kind="rpc",method="search",endpoint="rpc.php",status="200"} 1', text)
+        self.assertIn('ccr_request_seconds_bucket{kind="rpc",method="search",endpoint="rpc.php",le="60"} 1', text)
+        collector.reset()
+        self.assertEqual(collector.as_dict()["ccr_requests_total"], [])
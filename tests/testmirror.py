@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import patch
+import ccr.ccr
+from ccr.ccr import Struct, Package, PackageNotFound, info, search, msearch, list_orphans, set_offline
+from ccr.mirror import *
+from ccr.session import Session, VERIFY_STRICT
+from benchmarks.server import MockCCR, pointed_at
+
+
+def package(name, modified, maintainer="Guillaume", outofdate="0"):
+    return Struct(ID=str(modified), Name=name, Description="mock " + name, Maintainer=maintainer,
+                  MaintainerUID="0" if maintainer is None else "1", CategoryID="3",
+                  OutOfDate=outofdate, LastModified=str(modified))
+
+
+class TestMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.mirror = Mirror(":memory:")
+        self.packages = [package("pkg%d" % i, 100 - i) for i in range(30)]
+
+    @patch("ccr.mirror.latest")
+    def test_sync(self, latest):
+        latest.side_effect = lambda num: Struct(results=self.packages[:num])
+        # should keep asking for more until it reaches known packages
+        self.assertEqual(self.mirror.sync(batch=10), 30)
+        self.assertEqual(latest.call_count, 3)
+        self.assertEqual(self.mirror.high_water_mark, 100)
+        # should only store what changed since the last sync
+        self.packages.insert(0, package("pkg3", 101, outofdate="1"))
+        self.assertEqual(self.mirror.sync(batch=10), 1)
+        self.assertEqual(len(self.mirror), 30)
+        self.assertEqual(self.mirror.info("pkg3").OutOfDate, "1")
+        self.assertEqual([p.Name for p in self.mirror.outdated()], ["pkg3"])
+
+    @patch("ccr.mirror.search")
+    @patch("ccr.mirror.msearch")
+    def test_queries(self, msearch_, search_):
+        search_.return_value = self.packages[:5]
+        msearch_.return_value = [package("orphan", 1, maintainer=None)]
+        self.assertEqual(self.mirror.pull_search("pkg"), 5)
+        self.assertEqual(self.mirror.pull_msearch("0"), 1)
+        # should answer queries from the database
+        self.assertEqual(self.mirror.info("pkg1").Name, "pkg1")
+        self.assertRaises(PackageNotFound, self.mirror.info, "pkg10")
+        self.assertEqual(len(self.mirror.search("pkg")), 5)
+        self.assertEqual(len(self.mirror.search("%")), 0)
+        self.assertEqual(len(self.mirror.msearch("Guillaume")), 5)
+        self.assertEqual([p.Name for p in self.mirror.msearch("0")], ["orphan"])
+        self.assertEqual(len(self.mirror.category(3)), 6)
+        # should store compact Package rows too
+        self.mirror.store([Package(package("compact", 2))])
+        self.assertEqual(self.mirror.info("compact"), package("compact", 2))
+
+    def test_offline(self):
+        self.mirror.store(self.packages)
+        set_offline(self.mirror)
+        try:
+            with patch.object(ccr.ccr, "_get_ccr_json") as get:
+                # should answer from the mirror without touching the network
+                self.assertEqual(info("pkg1").Name, "pkg1")
+                self.assertEqual(len(search("pkg29")), 1)
+                self.assertEqual(len(msearch("Guillaume")), 30)
+                self.assertEqual(list_orphans(), [])
+                self.assertFalse(get.called)
+                # should go online when asked to
+                get.return_value = Struct(results=[])
+                self.assertEqual(search("pkg29", offline=False), [])
+                self.assertTrue(get.called)
+        finally:
+            set_offline(None)
+        # should refuse offline queries without a mirror
+        self.assertRaises(ValueError, info, "pkg1", offline=True)
+
+    def test_session(self):
+        with MockCCR(packages=5) as server, pointed_at(server.url):
+            self.mirror.store([info("pkg00001"), info("pkg00002")])
+            set_offline(self.mirror)
+            try:
+                # should act on and verify against the CCR, not the stale mirror
+                session = Session("mock", "mock", verification=VERIFY_STRICT)
+                session.flag("pkg00001")
+                session.delete("pkg00002")
+                self.assertEqual(session.bulk_action("unflag", ["pkg00001"]), {"pkg00001": None})
+                session.close()
+            finally:
+                set_offline(None)
+
+    def tearDown(self):
+        self.mirror.close()
@@ -0,0 +1,60 @@
+import email.parser
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from ccr.session import Session, InvalidPackage
+from ccr.multipart import *
+from benchmarks.server import MockCCR, pointed_at
+
+
+class TestMultipart(unittest.TestCase):
+
+    def test_encoder(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b"x" * 1000)
+            f.seek(10)
+            encoder = MultipartEncoder({"pkgsubmit": 1}, {"pfile": ("/tmp/my\"pkg.tar.gz", f)}, chunk_size=100)
+            parts = list(encoder)
+            body = b"".join(parts)
+            # should read the file in chunks, from where it was
+            self.assertLessEqual(max(len(part) for part in parts[2:-2]), 100)
+            self.assertEqual(len(encoder), len(body))
+            self.assertEqual(b"".join(encoder), body)
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + encoder.content_type.encode() + b"\r\n\r\n" + body)
+        fields = message.get_payload()
+        self.assertEqual(fields[0].get_param("name", header="content-disposition"), "pkgsubmit")
+        self.assertEqual(fields[0].get_payload(), "1")
+        self.assertEqual(fields[1].get_filename(), "my%22pkg.tar.gz")
+        self.assertEqual(fields[1].get_payload(decode=True), b"x" * 990)
+
+    def test_submit_many(self):
+        with MockCCR(packages=0) as server, pointed_at(server.url), \
+                tempfile.TemporaryDirectory() as tmpdir, Session("mock", "mock") as session:
+            files = [os.path.join(tmpdir, name) for name in ("one.src.tar.gz", "two.src.tar.gz", "three.zip")]
+            for path in files:
+                with open(path, "wb") as f:
+                    f.write(os.urandom(200000))
+            files.append(os.path.join(tmpdir, "missing.src.tar.gz"))
+            # should upload everything and report the failures per file
+            sessions = set()
+            submit = Session.submit
+
+            def tracked(worker, f, category):
+                self.assertIn("AURSID", worker._session.cookies)
+                sessions.add(worker)
+                return submit(worker, f, category)
+            with patch.object(Session, "submit", tracked):
+                report = session.submit_many(files, "devel", workers=2)
+            # should upload through a copy of the session per thread
+            self.assertNotIn(session, sessions)
+            self.assertLessEqual(len(sessions), 2)
+            self.assertEqual(list(report), files)
+            self.assertIsNone(report[files[0]])
+            self.assertIsNone(report[files[1]])
+            self.assertIsInstance(report[files[2]], InvalidPackage)
+            self.assertIsInstance(report[files[3]], OSError)
+            self.assertIsNotNone(server.get("one"))
+            self.assertIsNotNone(server.get("two"))
+            self.assertRaises(KeyError, session.submit_many, files, "nothing")
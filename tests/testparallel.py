@@ -0,0 +1,86 @@
+import threading
+import unittest
+from unittest.mock import patch
+import ccr.ccr
+from ccr.ccr import PackageNotFound, Struct
+from ccr.parallel import *
+from ccr.transport import Transport
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.packages = ["pkg%d" % i for i in range(20)]
+
+    @patch("ccr.parallel.info")
+    def test_map_info(self, info):
+        info.side_effect = lambda package: Struct(Name=package)
+        # should yield the results in input order
+        results = list(map_info(self.packages, workers=4))
+        self.assertEqual([name for name, _ in results], self.packages)
+        self.assertEqual([result.Name for _, result in results], self.packages)
+        # should yield every result when streaming them as they complete
+        results = dict(map_info(self.packages, workers=4, ordered=False))
+        self.assertEqual(sorted(results), sorted(self.packages))
+
+    @patch("ccr.parallel.info")
+    def test_map_info_errors(self, info):
+        info.side_effect = PackageNotFound("mock")
+        # should raise the first error by default
+        self.assertRaises(PackageNotFound, list, map_info(self.packages))
+        # should yield errors in place of results with return_exceptions
+        for _, result in map_info(self.packages, return_exceptions=True):
+            self.assertIsInstance(result, PackageNotFound)
+
+    @patch("ccr.parallel.msearch")
+    def test_workers(self, msearch):
+        # should never run more than 'workers' calls at once
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def fake_msearch(maintainer):
+            with lock:
+                running.append(maintainer)
+                peak.append(len(running))
+            threading.Event().wait(0.01)
+            with lock:
+                running.remove(maintainer)
+            return []
+        msearch.side_effect = fake_msearch
+        list(map_msearch(self.packages, workers=3))
+        self.assertLessEqual(max(peak), 3)
+
+    def test_configure_pool(self):
+        previous = ccr.ccr.get_transport()
+        try:
+            transport = Transport()
+            ccr.ccr.set_transport(transport)
+            # should resize the pool of the current transport in place
+            configure_pool(pool_connections=2, pool_maxsize=16)
+            self.assertIs(ccr.ccr.get_transport(), transport)
+            self.assertIs(ccr.ccr.session.get_adapter("https://mock"), transport.adapter)
+            self.assertEqual(transport.adapter._pool_maxsize, 16)
+            self.assertEqual(transport.adapter._pool_connections, 2)
+        finally:
+            ccr.ccr.set_transport(previous)
+
+    def test_pool_growth(self):
+        previous = ccr.ccr.get_transport()
+        try:
+            transport = Transport(pool_connections=3, pool_maxsize=50)
+            ccr.ccr.set_transport(transport)
+            former = transport.adapter.poolmanager
+            former.connection_from_url("http://mock")
+            with patch("ccr.parallel.search", side_effect=lambda keyword: []):
+                list(map_search(self.packages, workers=8))
+                # should keep a larger pool and the caller's other settings
+                self.assertEqual(transport.pool_maxsize, 50)
+                list(map_search(self.packages, workers=60))
+            # should grow the caller's transport, closing its former pool
+            self.assertIs(ccr.ccr.get_transport(), transport)
+            self.assertEqual(transport.adapter._pool_maxsize, 60)
+            self.assertEqual(transport.pool_connections, 3)
+            self.assertEqual(len(former.pools), 0)
+        finally:
+            ccr.ccr.set_transport(previous)
@@ -0,0 +1,120 @@
+import concurrent.futures
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from ccr.session import VERIFY_NONE
+from ccr.cookies import SESSION_TIMEOUT
+from ccr.pool import *
+import ccrauth.authdb
+from benchmarks.server import MockCCR, pointed_at
+
+
+class TestPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockCCR(packages=40).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.urls = pointed_at(self.server.url)
+        self.urls.__enter__()
+
+    def tearDown(self):
+        self.urls.__exit__(None, None, None)
+
+    def logins(self):
+        return len(self.server._sessions)
+
+    def test_checkout(self):
+        before = self.logins()
+        with SessionPool([("mock", "mock")], size=2, verification=VERIFY_NONE) as pool:
+            # should log in lazily, once per session
+            self.assertEqual(self.logins(), before)
+            first = pool.checkout()
+            second = pool.checkout("mock")
+            self.assertIsNot(first, second)
+            self.assertEqual(self.logins(), before + 2)
+            self.assertEqual(pool.stats(), {"mock": (2, 0)})
+            self.assertRaises(PoolTimeout, pool.checkout, timeout=0.05)
+            pool.checkin(first)
+            self.assertRaises(KeyError, pool.checkin, first)
+            # should hand out the idle session again
+            with pool.session() as session:
+                self.assertIs(session, first)
+                session.flag("pkg00001")
+            self.assertEqual(self.logins(), before + 2)
+            self.assertRaises(KeyError, pool.checkout, "other")
+            pool.checkin(second)
+        self.assertEqual(pool.stats(), {"mock": (0, 0)})
+        self.assertRaises(ValueError, pool.checkout)
+
+    def test_threads(self):
+        before = self.logins()
+        accounts = [("bot{}".format(number), "secret") for number in range(3)]
+        pool = SessionPool(accounts, size=2, verification=VERIFY_NONE)
+
+        def work(number):
+            username = accounts[number % 3][0]
+            with pool.session(username) as session:
+                self.assertEqual(session._username, username)
+                session.notify("pkg{:05d}".format(number))
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(work, range(1, 31)))
+        # should never hold more than 'size' sessions per account
+        self.assertLessEqual(self.logins() - before, 6)
+        self.assertEqual(sum(idle for _, idle in pool.stats().values()), self.logins() - before)
+        pool.close()
+
+    def test_cookie_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(ccrauth.authdb, "CCR_DB", os.path.join(tmpdir, "ccr.db")):
+            auth = ccrauth.authdb.AuthDB()
+            auth.store_auth_info("mock", "mock")
+            before = self.logins()
+            with SessionPool([auth], size=3) as pool:
+                sessions = [pool.checkout() for _ in range(3)]
+                # should log in once and share the saved login
+                self.assertEqual(self.logins(), before + 1)
+                for session in sessions:
+                    pool.checkin(session)
+
+    def test_health(self):
+        before = self.logins()
+        with SessionPool([("mock", "mock")], size=1) as pool:
+            with pool.session() as first:
+                pass
+            # should replace a session whose login expired
+            pool._idle["mock"][0].login -= SESSION_TIMEOUT
+            with pool.session() as second:
+                self.assertIsNot(second, first)
+            self.assertEqual(self.logins(), before + 2)
+            with pool.session() as third:
+                self.assertIs(third, second)
+
+    def test_eviction(self):
+        before = self.logins()
+        with SessionPool([("mock", "mock")], max_idle=0.05) as pool:
+            with pool.session():
+                pass
+            self.assertEqual(pool.evict(), 0)
+            time.sleep(0.1)
+            self.assertEqual(pool.evict(), 1)
+            self.assertEqual(pool.stats(), {"mock": (0, 0)})
+            # should close idle sessions on checkout too
+            with pool.session():
+                pass
+            time.sleep(0.1)
+            with pool.session():
+                self.assertEqual(pool.stats(), {"mock": (1, 0)})
+            self.assertEqual(self.logins(), before + 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+from requests import Request
+from requests.adapters import HTTPAdapter
+from ccr.ratelimit import *
+from ccr.transport import Transport
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_token_bucket(self):
+        clock = Mock(return_value=0.0)
+        with patch("ccr.ratelimit.time.monotonic", clock):
+            bucket = TokenBucket(rate=4, capacity=2)
+            # should let a burst through, then ask to wait for the rate
+            self.assertEqual(bucket._take(1), 0)
+            self.assertEqual(bucket._take(1), 0)
+            self.assertEqual(bucket._take(1), 0.25)
+            clock.return_value += 0.25
+            self.assertEqual(bucket._take(1), 0)
+            # should not save more than a burst
+            clock.return_value += 10
+            self.assertEqual(bucket._take(2), 0)
+            self.assertGreater(bucket._take(1), 0)
+        # should wait for the tokens
+        bucket = TokenBucket(rate=50, capacity=1)
+        bucket.acquire()
+        start = time.monotonic()
+        bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.015)
+
+    def test_priority(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+        order = []
+
+        def request(name, level):
+            with priority(level):
+                bucket.acquire()
+            order.append(name)
+        # should serve interactive requests before queued background ones
+        sweep = threading.Thread(target=request, args=("sweep", BACKGROUND))
+        sweep.start()
+        time.sleep(0.01)
+        lookup = threading.Thread(target=request, args=("lookup", INTERACTIVE))
+        lookup.start()
+        sweep.join()
+        lookup.join()
+        self.assertEqual(order, ["lookup", "sweep"])
+        with background():
+            self.assertEqual(current_priority(), BACKGROUND)
+        self.assertEqual(current_priority(), INTERACTIVE)
+
+    def test_sqlite_bucket(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "limits.db")
+            first = SQLiteBucket(path, rate=1, capacity=2)
+            second = SQLiteBucket(path, rate=1, capacity=2)
+            # should share one budget between buckets using the same file
+            self.assertEqual(first._take(1), 0)
+            self.assertEqual(second._take(1), 0)
+            self.assertGreater(first._take(1), 0)
+            first.close()
+            second.close()
+
+    def test_limiter(self):
+        limiter = Limiter()
+        limiter.reads = Mock()
+        limiter.writes = Mock()
+        # should take writes from their own budget
+        adapter = Transport(limiter=limiter).adapter
+        with patch.object(HTTPAdapter, "send"):
+            adapter.send(Request("POST", "https://mock/packages.php").prepare())
+            adapter.send(Request("GET", "https://mock/rpc.php").prepare())
+        self.assertEqual(limiter.writes.acquire.call_count, 1)
+        self.assertEqual(limiter.reads.acquire.call_count, 1)
@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import Mock
+from ccr.scan import *
+
+
+class TestScan(unittest.TestCase):
+
+    def test_scanner(self):
+        scanner = Scanner(["name='do_UnVote'", b"name='do_Vote'"])
+        chunks = iter([b"<html>", b"<input name='do_", b"UnVote' />", b"never read"])
+        data = bytearray()
+        # should find markers spanning chunks and stop reading there
+        self.assertEqual(scanner.search(chunks, data), "name='do_UnVote'")
+        self.assertEqual(data, b"<html><input name='do_UnVote' />")
+        self.assertEqual(list(chunks), [b"never read"])
+        self.assertEqual(scanner.search(iter([b"x" * 100, b"name='do_Vote'"]), bytearray()), b"name='do_Vote'")
+        # should return None once everything was read
+        data = bytearray()
+        self.assertIsNone(scanner.search(iter([b"name='do_", b"Nothing'"]), data))
+        self.assertEqual(data, b"name='do_Nothing'")
+
+    def test_release(self):
+        # should read the end of small bodies and give up on large ones
+        response = Mock()
+        chunks = iter([b"x" * 10] * 3)
+        release(response, chunks, limit=100)
+        self.assertEqual(list(chunks), [])
+        response.close.assert_called_once_with()
+        chunks = iter([b"x" * 60] * 3)
+        release(response, chunks, limit=100)
+        self.assertEqual(len(list(chunks)), 1)
+        # should not read at all when the body left is known to be large
+        response.raw.length_remaining = 180
+        chunks = iter([b"x" * 60] * 3)
+        release(response, chunks, limit=100)
+        self.assertEqual(len(list(chunks)), 3)
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import Mock, PropertyMock, mock_open, patch
 import requests
+from ccr.ccr import Struct
 from ccr.session import *
 from ccr.session import _VoteWarning, _FlagWarning, _DeleteWarning, _NotifyWarning, _OwnershipWarning, _SubmitWarning, _CategoryWarning
 
@@ -20,7 +21,14 @@ class TestSession(unittest.TestCase):
         self.session = Session()
         self.session._session.get = Mock()
         self.session._session.post = Mock()
+        # the pages are streamed: serve the mocked text in two chunks
+        for method in (self.session._session.get, self.session._session.post):
+            response = method.return_value
+            response.iter_content.side_effect = lambda size, response=response: iter(
+                [response.text[:10].encode(), response.text[10:].encode()])
         requests.get = Mock()
+        # the RPC responses are decoded from bytes
+        type(requests.get.return_value).content = PropertyMock(side_effect=lambda: requests.get.return_value.text.encode())
 
     def test_authenticate(self):
         # should pass if a cookie is created after a successful login
@@ -147,6 +155,90 @@ class TestSession(unittest.TestCase):
         # TODO Fix ccr.delete() method before writing the test
         pass
 
+    def test_bulk_action(self):
+        def row(name, outofdate="0", votes="1"):
+            return Struct(ID=name[-1], Name=name, OutOfDate=outofdate, NumVotes=votes, MaintainerUID="0")
+        before = {"pkg1": row("pkg1"), "pkg2": row("pkg2")}
+        with patch("ccr.session.info_many") as info_many:
+            # should POST every package at once and report failures per package
+            info_many.side_effect = [(before, ["mock"]),
+                                     ({"pkg1": row("pkg1", "1"), "pkg2": row("pkg2", "0")}, [])]
+            report = self.session.bulk_action("flag", ["pkg1", "pkg2", "mock"])
+            self.assertEqual(self.session._session.post.call_count, 1)
+            data = self.session._session.post.call_args[1]["data"]
+            self.assertEqual(data, {"IDs[1]": 1, "IDs[2]": 1, "do_Flag": 1})
+            self.assertIsNone(report["pkg1"])
+            self.assertIsInstance(report["pkg2"], _FlagWarning)
+            self.assertIsInstance(report["mock"], PackageNotFound)
+            # should verify votes with the vote count
+            info_many.side_effect = [(before, []), ({"pkg1": row("pkg1", votes="2"), "pkg2": row("pkg2")}, [])]
+            report = self.session.bulk_action("vote", ["pkg1", "pkg2"])
+            self.assertIsNone(report["pkg1"])
+            self.assertIsInstance(report["pkg2"], _VoteWarning)
+            # should verify deletes with missing packages
+            info_many.side_effect = [(before, []), ({"pkg2": row("pkg2")}, ["pkg1"])]
+            report = self.session.bulk_action("delete", ["pkg1", "pkg2"])
+            self.assertIsNone(report["pkg1"])
+            self.assertIsInstance(report["pkg2"], _DeleteWarning)
+            # should raise KeyError on an unknown action
+            self.assertRaises(KeyError, self.session.bulk_action, "mock", ["pkg1"])
+
+    def test_verification(self):
+        pkginfo = Struct(ID="1", Name=self.package, OutOfDate="0", MaintainerUID="0")
+        # should not re-query the CCR with VERIFY_NONE
+        session = Session(verification=VERIFY_NONE)
+        session._session.post = Mock()
+        with patch("ccr.session.info", return_value=pkginfo) as info:
+            session.flag(self.package)
+            self.assertEqual(info.call_count, 1)
+        # should collect the checks and run them in one batch with VERIFY_DEFERRED
+        session = Session(verification=VERIFY_DEFERRED)
+        session._session.post = Mock()
+        with patch("ccr.session.info", return_value=pkginfo) as info, \
+                patch("ccr.session.info_many") as info_many:
+            session.flag(self.package)
+            session.disown(self.package)
+            session.unflag("other")
+            self.assertEqual(info.call_count, 3)
+            info_many.return_value = ({self.package: Struct(pkginfo, OutOfDate="1"),
+                                       "other": Struct(pkginfo, OutOfDate="1")}, [])
+            report = session.verify_pending()
+            self.assertEqual(info_many.call_count, 1)
+            self.assertIsNone(report[self.package])
+            self.assertIsInstance(report["other"], _FlagWarning)
+            self.assertEqual(session.verify_pending(), {})
+            # should only check the last of the actions undoing each other
+            session.flag(self.package)
+            session.unflag(self.package)
+            info_many.return_value = ({self.package: pkginfo}, [])
+            self.assertEqual(session.verify_pending(), {self.package: None})
+            # should follow the policy in bulk_action too
+            info_many.reset_mock()
+            info_many.return_value = ({self.package: pkginfo}, [])
+            self.assertEqual(session.bulk_action("flag", [self.package]), {self.package: None})
+            self.assertEqual(info_many.call_count, 1)
+            report = session.verify_pending()
+            self.assertIsInstance(report[self.package], _FlagWarning)
+            self.assertEqual(info_many.call_count, 2)
+            # should keep the checks queued when the pass fails
+            session.flag(self.package)
+            info_many.side_effect = requests.ConnectionError
+            self.assertRaises(requests.ConnectionError, session.verify_pending)
+            info_many.side_effect = None
+            info_many.return_value = ({self.package: Struct(pkginfo, OutOfDate="1")}, [])
+            self.assertEqual(session.verify_pending(), {self.package: None})
+            # should report a voted package deleted since then
+            session._pending.append(("gone", "vote", None))
+            with patch.object(session, "check_vote", side_effect=PackageNotFound("gone")):
+                self.assertIsInstance(session.verify_pending()["gone"], PackageNotFound)
+            self.assertEqual(session._pending, [])
+            session.verification = VERIFY_NONE
+            session.bulk_action("flag", [self.package])
+            self.assertEqual(info_many.call_count, 5)
+            self.assertEqual(session.verify_pending(), {})
+        # should refuse unknown policies
+        self.assertRaises(ValueError, Session, verification="mock")
+
     def test_setcategory(self):
         # should pass if the category is valid and the server confirmation succeed
         requests.get.return_value.text = self.mock_valid_return_values
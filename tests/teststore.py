@@ -0,0 +1,81 @@
+import concurrent.futures
+import glob
+import mmap
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import ccr.ccr
+import ccr.store
+from ccr.ccr import pkgbuild_raw_url
+from ccr.store import *
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = Store(self.tmpdir.name)
+
+    def test_put_get(self):
+        # should deduplicate identical files
+        first = self.store.put("cdrtools", "PKGBUILD", b"pkgname=mock", "1")
+        second = self.store.put("ls++-git", "PKGBUILD", b"pkgname=mock", "2")
+        self.assertEqual(first, second)
+        self.assertEqual(self.store.size, len(b"pkgname=mock"))
+        self.assertEqual(self.store.get("cdrtools", "PKGBUILD"), b"pkgname=mock")
+        # should only return the requested version
+        self.assertIsNone(self.store.get("cdrtools", "PKGBUILD", "2"))
+        self.assertIsNone(self.store.get("mock", "PKGBUILD"))
+
+    def test_concurrent_put(self):
+        # should let writers of the same content race without failing
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            for number in range(20):
+                data = "pkgname=mock{}".format(number).encode() * 50000
+                digests = set(executor.map(lambda n: self.store.put("mock{}".format(n), "PKGBUILD", data),
+                                           range(8)))
+                self.assertEqual(len(digests), 1)
+        self.assertEqual(self.store.get("mock7", "PKGBUILD"), b"pkgname=mock19" * 50000)
+        self.assertEqual(glob.glob(self.tmpdir.name + "/objects/*/*.tmp"), [])
+
+    def test_mmap(self):
+        with patch.object(ccr.store, "MMAP_THRESHOLD", 4):
+            self.store.put("cdrtools", "cdrtools.install", b"post_install")
+            data = self.store.get("cdrtools", "cdrtools.install")
+            self.assertIsInstance(data, mmap.mmap)
+            self.assertEqual(data[:], b"post_install")
+            data.close()
+
+    def test_prune(self):
+        self.store.put("a", "PKGBUILD", b"a" * 10)
+        self.store.put("b", "PKGBUILD", b"b" * 10)
+        self.store.put("c", "PKGBUILD", b"c" * 10)
+        self.store.get("a", "PKGBUILD")
+        # should drop files no package references anymore
+        self.store.put("c", "PKGBUILD", b"d" * 10)
+        self.assertEqual(self.store.prune(100), 10)
+        # should evict the least recently used files first
+        self.assertEqual(self.store.prune(20), 10)
+        self.assertIsNone(self.store.get("b", "PKGBUILD"))
+        self.assertIsNotNone(self.store.get("a", "PKGBUILD"))
+        # should keep the store under max_size
+        store = Store(self.tmpdir.name, max_size=15)
+        store.put("e", "PKGBUILD", b"e" * 10)
+        self.assertLessEqual(store.size, 15)
+        store.close()
+
+    def test_get_pkgbuild(self):
+        with patch.object(ccr.ccr, "session", Mock()) as session:
+            session.get.return_value.content = b"pkgname=cdrtools"
+            # should fetch the PKGBUILD once and then answer from the store
+            self.assertEqual(self.store.get_pkgbuild("cdrtools", "1"), b"pkgname=cdrtools")
+            self.assertEqual(self.store.get_pkgbuild("cdrtools", "1"), b"pkgname=cdrtools")
+            self.assertEqual(session.get.call_count, 1)
+            self.assertEqual(session.get.call_args[0][0], pkgbuild_raw_url("cdrtools"))
+            # should fetch it again for another version
+            self.store.get_pkgbuild("cdrtools", "2")
+            self.assertEqual(session.get.call_count, 2)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+from requests.adapters import HTTPAdapter
+import ccr.ccr
+from ccr.ccr import get_transport, set_transport
+from ccr.session import Session
+from ccr.transport import *
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_adapter(self):
+        transport = Transport(pool_connections=2, pool_maxsize=20, connect_timeout=1,
+                              read_timeout=5, retries=4, backoff_factor=1, jitter=0)
+        adapter = transport.adapter
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 20)
+        self.assertEqual(adapter.max_retries.total, 4)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        # should apply the default timeout unless one is given
+        with patch.object(HTTPAdapter, "send") as send:
+            adapter.send("mock")
+            self.assertEqual(send.call_args[1]["timeout"], (1, 5))
+            adapter.send("mock", timeout=3)
+            self.assertEqual(send.call_args[1]["timeout"], 3)
+
+    def test_backoff(self):
+        retry = Transport(backoff_factor=1, jitter=0.5).adapter.max_retries
+        # should wait exponentially longer with some jitter
+        retry = retry.increment("GET", "/").increment("GET", "/").increment("GET", "/")
+        self.assertGreaterEqual(retry.get_backoff_time(), 4)
+        self.assertLessEqual(retry.get_backoff_time(), 4.5)
+
+    def test_shared_pool(self):
+        transport = Transport(keep_alive=False)
+        first = Session(transport=transport)
+        second = Session(transport=transport)
+        # should share the connection pool between sessions, not the cookies
+        self.assertIs(first._session.get_adapter("https://mock"), second._session.get_adapter("https://mock"))
+        self.assertIsNot(first._session.cookies, second._session.cookies)
+        self.assertEqual(first._session.headers["Connection"], "close")
+        transport.adapter.poolmanager.connection_from_url("http://mock")
+        # should keep the pool of the others when a session is closed
+        with Session(transport=transport):
+            pass
+        first.close()
+        second.close()
+        self.assertEqual(len(transport.adapter.poolmanager.pools), 1)
+        transport.close()
+        self.assertEqual(len(transport.adapter.poolmanager.pools), 0)
+
+    def test_set_transport(self):
+        previous = get_transport()
+        try:
+            transport = previous.replace(pool_maxsize=3)
+            self.assertEqual(transport.retries, previous.retries)
+            set_transport(transport)
+            # should be used by the static functions and new Sessions
+            self.assertIs(ccr.ccr.session.get_adapter("https://mock"), transport.adapter)
+            session = Session()
+            self.assertIs(session._session.get_adapter("https://mock"), transport.adapter)
+            session.close()
+        finally:
+            set_transport(previous)